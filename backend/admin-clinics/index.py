@@ -5,80 +5,669 @@ Args: event - dict with httpMethod, body, queryStringParameters, headers
 Returns: HTTP response dict with clinics data or update status
 '''
 
+import importlib
+import importlib.util
 import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
-from typing import Dict, Any, List
-import jwt
+import hashlib
+import base64
+import gzip
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Dict, Any, List, Tuple, Optional
+
+class LazyModule:
+    """Прокси модуля: импорт выполняется при первом обращении к атрибуту (быстрый холодный старт)"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+psycopg2 = LazyModule('psycopg2')
+psycopg2_extras = LazyModule('psycopg2.extras')
+jwt = LazyModule('jwt')
+brotli = LazyModule('brotli') if importlib.util.find_spec('brotli') else None
+
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING', '1') == '1'
+REQUEST_SPANS: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_spans', default=None)
+TIMED_CURSOR_CLASSES: Dict[Any, Any] = {}
+TIMED_CONNECTION_CLASS: List[Any] = []
+
+class Span:
+    """Замер шага обработки текущего запроса; вне запроса или при SERVER_TIMING=0 ничего не делает"""
+    __slots__ = ('name', 'spans', 'started')
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self) -> 'Span':
+        self.spans = REQUEST_SPANS.get()
+        if self.spans is not None:
+            self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> bool:
+        if self.spans is not None:
+            self.spans[self.name] = self.spans.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+def timed_cursor_class(base):
+    """Подкласс курсора, который замеряет execute и fetch* в спанах db_execute и db_fetch"""
+    timed = TIMED_CURSOR_CLASSES.get(base)
+    if timed is None:
+        class TimedCursor(base):
+            def execute(self, query, vars=None):
+                with Span('db_execute'):
+                    return super().execute(query, vars)
+            
+            def copy_expert(self, sql, file, size=8192):
+                with Span('db_execute'):
+                    return super().copy_expert(sql, file, size)
+            
+            def fetchone(self):
+                with Span('db_fetch'):
+                    return super().fetchone()
+            
+            def fetchmany(self, size=None):
+                with Span('db_fetch'):
+                    return super().fetchmany(size) if size is not None else super().fetchmany()
+            
+            def fetchall(self):
+                with Span('db_fetch'):
+                    return super().fetchall()
+        
+        timed = TIMED_CURSOR_CLASSES[base] = TimedCursor
+    return timed
+
+def timed_connection_class():
+    """Класс подключения, все курсоры которого замеряются"""
+    if not TIMED_CONNECTION_CLASS:
+        class TimedConnection(psycopg2.extensions.connection):
+            def cursor(self, *args, **kwargs):
+                base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+                kwargs['cursor_factory'] = timed_cursor_class(base)
+                return super().cursor(*args, **kwargs)
+        
+        TIMED_CONNECTION_CLASS.append(TimedConnection)
+    return TIMED_CONNECTION_CLASS[0]
+
+def with_server_timing(event: Dict[str, Any], context: Any, route) -> Dict[str, Any]:
+    """Обработка запроса со сбором спанов: заголовок Server-Timing и одна строка лога по request_id"""
+    if not SERVER_TIMING_ENABLED or event.get('httpMethod') == 'OPTIONS':
+        return route(event, context)
+    
+    spans: Dict[str, float] = {}
+    token = REQUEST_SPANS.set(spans)
+    started = time.perf_counter()
+    try:
+        response = route(event, context)
+    finally:
+        REQUEST_SPANS.reset(token)
+    total = time.perf_counter() - started
+    
+    timings = {name: round(seconds * 1000, 2) for name, seconds in spans.items()}
+    timing_header = ', '.join(f'{name};dur={ms}' for name, ms in timings.items())
+    headers = dict(response.get('headers') or {})
+    exposed = headers.get('Access-Control-Expose-Headers')
+    headers.update({
+        'Server-Timing': f"{timing_header + ', ' if timing_header else ''}total;dur={round(total * 1000, 2)}",
+        'Timing-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': f'{exposed}, Server-Timing' if exposed else 'Server-Timing'
+    })
+    print(json.dumps({
+        'event': 'request_timing',
+        'request_id': getattr(context, 'request_id', None),
+        'function': getattr(context, 'function_name', None),
+        'method': event.get('httpMethod'),
+        'action': (event.get('queryStringParameters') or {}).get('action'),
+        'status': response.get('statusCode'),
+        'total_ms': round(total * 1000, 2),
+        'spans': timings
+    }))
+    return {**response, 'headers': headers}
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_WAIT_TIMEOUT', '5'))
+DB_POOL_HEALTHCHECK_AFTER = float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER', '30'))
+
+class ConnectionPool:
+    """Пул подключений к БД, переживающий вызовы в тёплом контейнере"""
+    
+    def __init__(self, max_size: int, wait_timeout: float, healthcheck_after: float):
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.healthcheck_after = healthcheck_after
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'reconnects': 0}
+    
+    def _connect(self):
+        if SERVER_TIMING_ENABLED:
+            return psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=timed_connection_class())
+        return psycopg2.connect(os.environ.get('DATABASE_URL'))
+    
+    def _close_quietly(self, conn) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+    
+    def _discard(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+    
+    def _is_alive(self, conn, idle_since: float) -> bool:
+        """Проверка подключения перед выдачей: пинг только после долгого простоя"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def acquire(self):
+        """Выдача подключения: свободное из пула, новое в пределах лимита или ожидание"""
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._stats['hits'] += 1
+                    break
+                if self._size < self.max_size:
+                    conn, idle_since = None, 0.0
+                    self._size += 1
+                    self._stats['misses'] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise psycopg2.OperationalError('Пул подключений к БД исчерпан')
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+        
+        try:
+            if conn is None:
+                return self._connect()
+            if not self._is_alive(conn, idle_since):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._stats['reconnects'] += 1
+                return self._connect()
+            return conn
+        except Exception:
+            self._discard()
+            raise
+    
+    def release(self, conn) -> None:
+        """Возврат подключения в пул с откатом незавершенной транзакции"""
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close_quietly(conn)
+        
+        if conn.closed:
+            self._discard()
+            return
+        
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий/промахов/ожиданий пула"""
+        with self._cond:
+            return {**self._stats, 'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+DB_POOL = ConnectionPool(DB_POOL_MAX_SIZE, DB_POOL_WAIT_TIMEOUT, DB_POOL_HEALTHCHECK_AFTER)
 
 def get_db_connection():
-    """Создание подключения к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url)
+    """Получение подключения к БД из пула"""
+    with Span('db_connect'):
+        return DB_POOL.acquire()
+
+def release_db_connection(conn) -> None:
+    """Возврат подключения в пул вместо закрытия"""
+    DB_POOL.release(conn)
+
+JSON_FAST_ENCODERS = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    Decimal: float
+}
+
+def json_default(value: Any) -> Any:
+    """Сериализация datetime/date/Decimal без промежуточных копий строк"""
+    encoder = JSON_FAST_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Тип {type(value).__name__} не поддерживается')
+    return encoder(value)
+
+JSON_ENCODER = json.JSONEncoder(default=json_default)
+
+def to_json(data: Any) -> str:
+    """Кодирование ответа (включая строки курсора) напрямую в тело ответа"""
+    with Span('serialize'):
+        return JSON_ENCODER.encode(data)
+
+def cast_iso_datetime(value: Optional[str], cur) -> Optional[str]:
+    return value.replace(' ', 'T', 1) if value is not None else None
+
+def cast_float(value: Optional[str], cur) -> Optional[float]:
+    return float(value) if value is not None else None
+
+JSON_READY_CASTS: List[Any] = []
+
+def register_json_casts(cur) -> None:
+    """Даты и NUMERIC приходят из драйвера сразу в виде JSON-совместимых значений (только для чтения)"""
+    if not JSON_READY_CASTS:
+        JSON_READY_CASTS.extend([
+            psycopg2.extensions.new_type((1082, 1114), 'ISO_DATETIME', cast_iso_datetime),
+            psycopg2.extensions.new_type((1700,), 'NUMERIC_FLOAT', cast_float)
+        ])
+    for cast in JSON_READY_CASTS:
+        psycopg2.extensions.register_type(cast, cur)
+
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+
+class VerifiedTokenCache:
+    """LRU-кеш проверенных токенов: ключ - SHA-256 токена, значение - payload до момента exp"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+    
+    def _key(self, token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Payload ранее проверенного токена или None"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return payload
+    
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """Сохранение payload успешно проверенного токена (только токены с exp)"""
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)):
+            return
+        
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики и доля попаданий кеша"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+TOKEN_CACHE = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+REVOCATION_FULL_RELOAD_INTERVAL = float(os.environ.get('REVOCATION_FULL_RELOAD_INTERVAL', '600'))
+REVOCATION_BLOOM_BITS = int(os.environ.get('REVOCATION_BLOOM_BITS', str(1 << 16)))
+REVOCATION_BLOOM_HASHES = 4
+
+REVOKED_TOKENS_SQL = """
+    SELECT id, jti, admin_id, EXTRACT(EPOCH FROM revoked_at)::float8 AS revoked_at
+    FROM revoked_tokens
+    WHERE id > %s AND expires_at > now()
+    ORDER BY id
+"""
+
+class RevocationFilter:
+    """Отозванные токены администраторов в памяти: фильтр Блума отсекает почти все проверки, точное множество
+    подтверждает попадание. revoked_tokens дочитывается раз в refresh_interval, а не на каждый запрос"""
+    
+    def __init__(self, refresh_interval: float, full_reload_interval: float, bloom_bits: int):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.bloom_bits = bloom_bits
+        self._bloom = bytearray((bloom_bits + 7) // 8)
+        self._jtis: set = set()
+        self._admins: Dict[int, float] = {}
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats = {'checks': 0, 'bloom_hits': 0, 'false_positives': 0, 'revoked': 0, 'refreshes': 0, 'errors': 0}
+    
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        return [int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % self.bloom_bits for i in range(REVOCATION_BLOOM_HASHES)]
+    
+    def _add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bloom[position >> 3] |= 1 << (position & 7)
+    
+    def _might_contain(self, key: str) -> bool:
+        return all(self._bloom[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+    
+    def _apply(self, jti: Optional[str], admin_id: Optional[int], revoked_at: float) -> None:
+        if jti:
+            self._jtis.add(jti)
+            self._add(jti)
+        elif admin_id is not None:
+            self._admins[admin_id] = max(revoked_at, self._admins.get(admin_id, 0.0))
+            self._add(f'admin:{admin_id}')
+    
+    def refresh(self) -> None:
+        """Дочитывание новых отзывов; раз в full_reload_interval фильтр строится заново без истекших строк"""
+        now = time.monotonic()
+        if self._refreshed_at and now - self._refreshed_at < self.refresh_interval:
+            return
+        # Первую загрузку ждут все запросы, дальше обновляет один поток, остальные работают по текущему состоянию
+        if not self._refresh_lock.acquire(blocking=not self._reloaded_at):
+            return
+        conn = None
+        try:
+            if self._refreshed_at and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            full = not self._reloaded_at or now - self._reloaded_at >= self.full_reload_interval
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute(REVOKED_TOKENS_SQL, (0 if full else self._last_id,))
+                rows = cur.fetchall()
+            
+            with self._lock:
+                if full:
+                    self._bloom = bytearray(len(self._bloom))
+                    self._jtis = set()
+                    self._admins = {}
+                    self._reloaded_at = now
+                for row_id, jti, admin_id, revoked_at in rows:
+                    self._apply(jti, admin_id, revoked_at)
+                    self._last_id = max(self._last_id, row_id)
+                self._refreshed_at = now
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            # БД недоступна: работаем по последнему загруженному состоянию и повторяем через интервал
+            with self._lock:
+                self._refreshed_at = now
+                self._stats['errors'] += 1
+            print(json.dumps({'event': 'revocations_refresh_failed', 'error': str(e)}))
+        finally:
+            if conn is not None:
+                release_db_connection(conn)
+            self._refresh_lock.release()
+    
+    def remember(self, jti: str) -> None:
+        """Немедленный учет отзыва, записанного этим же процессом"""
+        with self._lock:
+            self._apply(jti, None, 0.0)
+    
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Проверка payload за константное время; запрос к БД только при устаревшем состоянии"""
+        self.refresh()
+        jti = payload.get('jti')
+        admin_id = payload.get('admin_id')
+        with self._lock:
+            self._stats['checks'] += 1
+            if jti and self._might_contain(jti):
+                self._stats['bloom_hits'] += 1
+                if jti in self._jtis:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+            if admin_id is not None and self._might_contain(f'admin:{admin_id}'):
+                self._stats['bloom_hits'] += 1
+                revoked_at = self._admins.get(admin_id)
+                if revoked_at is not None and payload.get('iat', 0) <= revoked_at:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'jtis': len(self._jtis), 'admins': len(self._admins), 'last_id': self._last_id}
+
+REVOKED_TOKENS = RevocationFilter(REVOCATION_REFRESH_INTERVAL, REVOCATION_FULL_RELOAD_INTERVAL, REVOCATION_BLOOM_BITS)
 
 def verify_admin_token(token: str) -> Dict[str, Any]:
-    """Проверка JWT токена администратора"""
-    secret_key = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+    """Проверка JWT токена администратора (повторные токены берутся из кеша без проверки подписи, отзыв проверяется всегда)"""
+    payload = TOKEN_CACHE.get(token)
+    
+    if payload is None:
+        try:
+            with Span('jwt'):
+                payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return {'valid': False, 'error': 'Токен истек'}
+        except jwt.InvalidTokenError:
+            return {'valid': False, 'error': 'Недействительный токен'}
+        TOKEN_CACHE.put(token, payload)
+    
+    if payload.get('user_type') != 'admin':
+        return {'valid': False, 'error': 'Недостаточно прав'}
+    if REVOKED_TOKENS.is_revoked(payload):
+        return {'valid': False, 'error': 'Токен отозван'}
+    return {'valid': True, 'payload': payload}
+
+LIST_PAGE_DEFAULT_LIMIT = 50
+LIST_PAGE_MAX_LIMIT = 200
+
+def encode_cursor(values: List[Any]) -> str:
+    """Кодирование ключа сортировки последней строки в непрозрачный курсор"""
+    raw = json.dumps([
+        v.isoformat() if isinstance(v, datetime) else str(v) if isinstance(v, Decimal) else v
+        for v in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, key_size: int) -> List[Any]:
+    """Разбор курсора, полученного от клиента"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(values, list) or len(values) != key_size:
+        raise ValueError('Некорректный курсор')
+    
+    # Ключ курсора: [rank,] created_at, id; значения проверяются и приводятся к типам до подстановки в запрос
+    *ranks, created_at, row_id = values
+    if isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(created_at, str):
+        raise ValueError('Некорректный курсор')
+    try:
+        created_at = datetime.fromisoformat(created_at)
+    except ValueError:
+        raise ValueError('Некорректный курсор')
+    
+    parsed_ranks = []
+    for rank in ranks:
+        if isinstance(rank, bool) or not isinstance(rank, (int, float, str)):
+            raise ValueError('Некорректный курсор')
+        try:
+            rank = Decimal(str(rank))
+        except ArithmeticError:
+            raise ValueError('Некорректный курсор')
+        if not rank.is_finite() or not 0 <= rank <= 1:
+            raise ValueError('Некорректный курсор')
+        parsed_ranks.append(rank)
+    
+    return parsed_ranks + [created_at, row_id]
+
+def parse_page_params(filters: Dict[str, Any], key_size: int) -> Tuple[Optional[int], Optional[List[Any]]]:
+    """Параметры постраничной выборки: limit и курсор after (без них - весь список)"""
+    if not filters.get('limit') and not filters.get('after'):
+        return None, None
     
     try:
-        payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-        if payload.get('user_type') != 'admin':
-            return {'valid': False, 'error': 'Недостаточно прав'}
-        return {'valid': True, 'payload': payload}
-    except jwt.ExpiredSignatureError:
-        return {'valid': False, 'error': 'Токен истек'}
-    except jwt.InvalidTokenError:
-        return {'valid': False, 'error': 'Недействительный токен'}
+        limit = int(filters.get('limit') or LIST_PAGE_DEFAULT_LIMIT)
+    except ValueError:
+        raise ValueError('Некорректный limit')
+    limit = max(1, min(limit, LIST_PAGE_MAX_LIMIT))
+    
+    after = decode_cursor(filters['after'], key_size) if filters.get('after') else None
+    return limit, after
+
+def escape_like(term: str) -> str:
+    """Экранирование спецсимволов шаблона LIKE"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_search(term: str, columns: List[str], conditions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Поиск подстроки по GIN-индексам pg_trgm и выражение релевантности для сортировки"""
+    conditions = conditions or [f"{column} ILIKE %s" for column in columns]
+    pattern = f"%{escape_like(term)}%"
+    similarities = ', '.join(f"word_similarity(%s, {column})" for column in columns)
+    return {
+        'where': f"({' OR '.join(conditions)})",
+        'where_params': [pattern] * len(conditions),
+        'rank': f"ROUND(GREATEST({similarities})::numeric, 4)",
+        'rank_params': [term] * len(columns)
+    }
+
+CLINIC_LIST_FIELDS = (
+    'id', 'clinic_name', 'email', 'phone', 'region', 'city',
+    'account_status', 'registration_date', 'last_login',
+    'total_orders_count', 'completed_visits_count', 'active_orders_count',
+    'total_orders_amount', 'average_service_rating',
+    'contact_person_name', 'inn'
+)
+
+def parse_fields(requested: Optional[str], whitelist: Tuple[str, ...]) -> Optional[List[str]]:
+    """Поля из параметра fields=a,b,c (None - полный набор); ValueError для полей вне белого списка"""
+    if not requested:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in whitelist]
+    if unknown:
+        raise ValueError(f"Недопустимые поля: {', '.join(unknown)}")
+    if not names:
+        raise ValueError('Параметр fields не содержит полей')
+    return names
+
+def drop_hidden_fields(rows: List[Dict[str, Any]], hidden: List[str]) -> None:
+    """Удаление служебных колонок (ключи курсора), которые клиент не запрашивал"""
+    if hidden:
+        for row in rows:
+            for name in hidden:
+                del row[name]
 
 def get_clinics_list(filters: Dict[str, Any]) -> Dict[str, Any]:
     """Получение списка клиник с фильтрами"""
+    try:
+        limit, after = parse_page_params(filters, 3 if filters.get('search') else 2)
+        fields = parse_fields(filters.get('fields'), CLINIC_LIST_FIELDS)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+    
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = """
-                SELECT 
-                    id, clinic_name, email, phone, region, city,
-                    account_status, registration_date, last_login,
-                    total_orders_count, completed_visits_count, active_orders_count,
-                    total_orders_amount, average_service_rating,
-                    contact_person_name, inn
-                FROM clinics
-                WHERE 1=1
-            """
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            search = None
+            rank_column = ''
             params = []
             
+            if filters.get('search'):
+                search = build_search(filters['search'], ['clinic_name', 'email', 'city'])
+                rank_column = f", {search['rank']} AS search_rank"
+                params.extend(search['rank_params'])
+            
+            hidden = [key for key in ('registration_date', 'id') if fields and key not in fields]
+            columns = ', '.join((fields or list(CLINIC_LIST_FIELDS)) + hidden)
+            query = f"SELECT {columns}{rank_column} FROM clinics WHERE 1=1"
+            
             if filters.get('status'):
                 query += " AND account_status = %s"
                 params.append(filters['status'])
             
-            if filters.get('search'):
-                query += " AND (clinic_name ILIKE %s OR email ILIKE %s OR city ILIKE %s)"
-                search_term = f"%{filters['search']}%"
-                params.extend([search_term, search_term, search_term])
+            if search:
+                query += f" AND {search['where']}"
+                params.extend(search['where_params'])
+            
+            if after and search:
+                query += f" AND ({search['rank']}, registration_date, id) < (%s::numeric, %s::timestamp, %s)"
+                params.extend(search['rank_params'] + after)
+            elif after:
+                query += " AND (registration_date, id) < (%s::timestamp, %s)"
+                params.extend(after)
             
-            query += " ORDER BY registration_date DESC"
+            if search:
+                query += " ORDER BY search_rank DESC, registration_date DESC, id DESC"
+            else:
+                query += " ORDER BY registration_date DESC, id DESC"
+            
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit + 1)
             
             cur.execute(query, params)
             clinics = cur.fetchall()
             
-            clinics_list = []
-            for clinic in clinics:
-                clinic_dict = dict(clinic)
-                if clinic_dict['registration_date']:
-                    clinic_dict['registration_date'] = clinic_dict['registration_date'].isoformat()
-                if clinic_dict['last_login']:
-                    clinic_dict['last_login'] = clinic_dict['last_login'].isoformat()
-                clinics_list.append(clinic_dict)
+            next_cursor = None
+            if limit and len(clinics) > limit:
+                clinics = clinics[:limit]
+                last = clinics[-1]
+                cursor_key = [last['registration_date'], last['id']]
+                next_cursor = encode_cursor([last['search_rank']] + cursor_key if search else cursor_key)
+            
+            drop_hidden_fields(clinics, hidden)
             
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
+                'body': to_json({
                     'success': True,
-                    'clinics': clinics_list,
-                    'total': len(clinics_list)
+                    'clinics': clinics,
+                    'total': len(clinics),
+                    'next_cursor': next_cursor
                 })
             }
     except Exception as e:
@@ -88,7 +677,7 @@ def get_clinics_list(filters: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка получения списка: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 def update_clinic_status(clinic_id: int, new_status: str, admin_id: int) -> Dict[str, Any]:
     """Изменение статуса клиники"""
@@ -101,7 +690,7 @@ def update_clinic_status(clinic_id: int, new_status: str, admin_id: int) -> Dict
     
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
             cur.execute("""
                 UPDATE clinics 
                 SET account_status = %s, updated_at = %s
@@ -137,13 +726,13 @@ def update_clinic_status(clinic_id: int, new_status: str, admin_id: int) -> Dict
             'body': json.dumps({'error': f'Ошибка обновления статуса: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 def update_clinic_notes(clinic_id: int, notes: str) -> Dict[str, Any]:
     """Обновление заметок администратора"""
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
             cur.execute("""
                 UPDATE clinics 
                 SET admin_notes = %s, updated_at = %s
@@ -178,9 +767,111 @@ def update_clinic_notes(clinic_id: int, notes: str) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка обновления заметок: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1400'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+COMPRESSION_STATS = {'compressed': 0, 'skipped_small': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0}
+COMPRESSION_LOCK = threading.Lock()
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Кодировки из Accept-Encoding с их q-весами"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        accepted[name.strip().lower()] = weight
+    return accepted
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """Лучшая поддерживаемая кодировка: br (если установлен brotli), затем gzip"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = (['br'] if brotli else []) + ['gzip']
+    best = max(candidates, key=lambda name: accepted.get(name, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """Сжатие тела ответа по Accept-Encoding, если оно больше COMPRESSION_MIN_BYTES"""
+    body = response.get('body')
+    if response.get('statusCode') != 200 or response.get('isBase64Encoded') or not isinstance(body, str):
+        return response
+    
+    headers = event.get('headers') or {}
+    encoding = choose_encoding(headers.get('Accept-Encoding') or headers.get('accept-encoding'))
+    if not encoding:
+        return response
+    
+    raw = body.encode('utf-8')
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        with COMPRESSION_LOCK:
+            COMPRESSION_STATS['skipped_small'] += 1
+        return response
+    
+    started = time.process_time()
+    with Span('compress'):
+        if encoding == 'br':
+            compressed = brotli.compress(raw, quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(raw, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+    cpu_ms = (time.process_time() - started) * 1000
+    ratio = len(compressed) / len(raw)
+    
+    with COMPRESSION_LOCK:
+        COMPRESSION_STATS['compressed'] += 1
+        COMPRESSION_STATS['bytes_in'] += len(raw)
+        COMPRESSION_STATS['bytes_out'] += len(compressed)
+        COMPRESSION_STATS['cpu_ms'] += cpu_ms
+    
+    response_headers = dict(response.get('headers') or {})
+    exposed = response_headers.get('Access-Control-Expose-Headers')
+    response_headers.update({
+        'Content-Encoding': encoding,
+        'Vary': 'Accept-Encoding',
+        'X-Compression': f'{encoding}; ratio={ratio:.3f}; cpu_ms={cpu_ms:.2f}; original={len(raw)}',
+        'Access-Control-Expose-Headers': f'{exposed}, X-Compression' if exposed else 'X-Compression'
+    })
+    return {
+        **response,
+        'headers': response_headers,
+        'isBase64Encoded': True,
+        'body': base64.b64encode(compressed).decode('ascii')
+    }
+
+def compression_stats() -> Dict[str, Any]:
+    """Суммарная степень сжатия и затраты CPU текущего контейнера"""
+    with COMPRESSION_LOCK:
+        stats = dict(COMPRESSION_STATS)
+    stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 4) if stats['bytes_in'] else None
+    stats['cpu_ms'] = round(stats['cpu_ms'], 2)
+    stats['min_bytes'] = COMPRESSION_MIN_BYTES
+    stats['brotli'] = brotli is not None
+    return stats
+
+def get_metrics() -> Dict[str, Any]:
+    """Счетчики производительности текущего контейнера"""
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'success': True,
+            'db_pool': DB_POOL.stats(),
+            'token_cache': TOKEN_CACHE.stats(),
+            'revocations': REVOKED_TOKENS.stats(),
+            'compression': compression_stats()
+        })
+    }
+
+def route_request(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
@@ -217,6 +908,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     if method == 'GET':
         query_params = event.get('queryStringParameters') or {}
+        
+        if query_params.get('action') == 'metrics':
+            return get_metrics()
+        
         return get_clinics_list(query_params)
     
     elif method == 'PUT':
@@ -261,3 +956,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
         'body': json.dumps({'error': 'Метод не поддерживается'})
     }
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return with_server_timing(event, context, lambda event, context: compress_response(event, route_request(event, context)))
@@ -5,79 +5,756 @@ Args: event - dict with httpMethod, body, queryStringParameters, headers
 Returns: HTTP response dict with doctors data or operation status
 '''
 
+import importlib
+import importlib.util
 import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
-from typing import Dict, Any, List, Optional
-import jwt
+import hashlib
+import base64
+import gzip
+import csv
+import io
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+
+class LazyModule:
+    """Прокси модуля: импорт выполняется при первом обращении к атрибуту (быстрый холодный старт)"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+psycopg2 = LazyModule('psycopg2')
+psycopg2_extras = LazyModule('psycopg2.extras')
+jwt = LazyModule('jwt')
+brotli = LazyModule('brotli') if importlib.util.find_spec('brotli') else None
+
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING', '1') == '1'
+REQUEST_SPANS: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_spans', default=None)
+TIMED_CURSOR_CLASSES: Dict[Any, Any] = {}
+TIMED_CONNECTION_CLASS: List[Any] = []
+
+class Span:
+    """Замер шага обработки текущего запроса; вне запроса или при SERVER_TIMING=0 ничего не делает"""
+    __slots__ = ('name', 'spans', 'started')
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self) -> 'Span':
+        self.spans = REQUEST_SPANS.get()
+        if self.spans is not None:
+            self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> bool:
+        if self.spans is not None:
+            self.spans[self.name] = self.spans.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+def timed_cursor_class(base):
+    """Подкласс курсора, который замеряет execute и fetch* в спанах db_execute и db_fetch"""
+    timed = TIMED_CURSOR_CLASSES.get(base)
+    if timed is None:
+        class TimedCursor(base):
+            def execute(self, query, vars=None):
+                with Span('db_execute'):
+                    return super().execute(query, vars)
+            
+            def copy_expert(self, sql, file, size=8192):
+                with Span('db_execute'):
+                    return super().copy_expert(sql, file, size)
+            
+            def fetchone(self):
+                with Span('db_fetch'):
+                    return super().fetchone()
+            
+            def fetchmany(self, size=None):
+                with Span('db_fetch'):
+                    return super().fetchmany(size) if size is not None else super().fetchmany()
+            
+            def fetchall(self):
+                with Span('db_fetch'):
+                    return super().fetchall()
+        
+        timed = TIMED_CURSOR_CLASSES[base] = TimedCursor
+    return timed
+
+def timed_connection_class():
+    """Класс подключения, все курсоры которого замеряются"""
+    if not TIMED_CONNECTION_CLASS:
+        class TimedConnection(psycopg2.extensions.connection):
+            def cursor(self, *args, **kwargs):
+                base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+                kwargs['cursor_factory'] = timed_cursor_class(base)
+                return super().cursor(*args, **kwargs)
+        
+        TIMED_CONNECTION_CLASS.append(TimedConnection)
+    return TIMED_CONNECTION_CLASS[0]
+
+def with_server_timing(event: Dict[str, Any], context: Any, route) -> Dict[str, Any]:
+    """Обработка запроса со сбором спанов: заголовок Server-Timing и одна строка лога по request_id"""
+    if not SERVER_TIMING_ENABLED or event.get('httpMethod') == 'OPTIONS':
+        return route(event, context)
+    
+    spans: Dict[str, float] = {}
+    token = REQUEST_SPANS.set(spans)
+    started = time.perf_counter()
+    try:
+        response = route(event, context)
+    finally:
+        REQUEST_SPANS.reset(token)
+    total = time.perf_counter() - started
+    
+    timings = {name: round(seconds * 1000, 2) for name, seconds in spans.items()}
+    timing_header = ', '.join(f'{name};dur={ms}' for name, ms in timings.items())
+    headers = dict(response.get('headers') or {})
+    exposed = headers.get('Access-Control-Expose-Headers')
+    headers.update({
+        'Server-Timing': f"{timing_header + ', ' if timing_header else ''}total;dur={round(total * 1000, 2)}",
+        'Timing-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': f'{exposed}, Server-Timing' if exposed else 'Server-Timing'
+    })
+    print(json.dumps({
+        'event': 'request_timing',
+        'request_id': getattr(context, 'request_id', None),
+        'function': getattr(context, 'function_name', None),
+        'method': event.get('httpMethod'),
+        'action': (event.get('queryStringParameters') or {}).get('action'),
+        'status': response.get('statusCode'),
+        'total_ms': round(total * 1000, 2),
+        'spans': timings
+    }))
+    return {**response, 'headers': headers}
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_WAIT_TIMEOUT', '5'))
+DB_POOL_HEALTHCHECK_AFTER = float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER', '30'))
+
+class ConnectionPool:
+    """Пул подключений к БД, переживающий вызовы в тёплом контейнере"""
+    
+    def __init__(self, max_size: int, wait_timeout: float, healthcheck_after: float):
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.healthcheck_after = healthcheck_after
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'reconnects': 0}
+    
+    def _connect(self):
+        if SERVER_TIMING_ENABLED:
+            return psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=timed_connection_class())
+        return psycopg2.connect(os.environ.get('DATABASE_URL'))
+    
+    def _close_quietly(self, conn) -> None:
+        STATEMENTS.forget(conn)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+    
+    def _discard(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+    
+    def _is_alive(self, conn, idle_since: float) -> bool:
+        """Проверка подключения перед выдачей: пинг только после долгого простоя"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def acquire(self):
+        """Выдача подключения: свободное из пула, новое в пределах лимита или ожидание"""
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._stats['hits'] += 1
+                    break
+                if self._size < self.max_size:
+                    conn, idle_since = None, 0.0
+                    self._size += 1
+                    self._stats['misses'] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise psycopg2.OperationalError('Пул подключений к БД исчерпан')
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+        
+        try:
+            if conn is None:
+                return self._connect()
+            if not self._is_alive(conn, idle_since):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._stats['reconnects'] += 1
+                return self._connect()
+            return conn
+        except Exception:
+            self._discard()
+            raise
+    
+    def release(self, conn) -> None:
+        """Возврат подключения в пул с откатом незавершенной транзакции"""
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close_quietly(conn)
+        
+        if conn.closed:
+            STATEMENTS.forget(conn)
+            self._discard()
+            return
+        
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий/промахов/ожиданий пула"""
+        with self._cond:
+            return {**self._stats, 'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+DB_POOL = ConnectionPool(DB_POOL_MAX_SIZE, DB_POOL_WAIT_TIMEOUT, DB_POOL_HEALTHCHECK_AFTER)
 
 def get_db_connection():
-    """Создание подключения к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url)
+    """Получение подключения к БД из пула"""
+    with Span('db_connect'):
+        return DB_POOL.acquire()
+
+def release_db_connection(conn) -> None:
+    """Возврат подключения в пул вместо закрытия"""
+    DB_POOL.release(conn)
+
+JSON_FAST_ENCODERS = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    Decimal: float
+}
+
+DB_PREPARED_STATEMENTS = os.environ.get('DB_PREPARED_STATEMENTS', '1') == '1'
+PREPARED_STATEMENT_ERRORS = ('26000', '42P05')
+PREPARED_PLAN_CHANGED = '0A000'
+
+class StatementRegistry:
+    """Горячие запросы с неизменным текстом: PREPARE один раз на подключение пула, дальше EXECUTE.
+    При DB_PREPARED_STATEMENTS=0 или за пулером в режиме транзакций выполняются обычным execute"""
+    
+    def __init__(self, queries: Dict[str, str], enabled: bool):
+        self.queries = queries
+        self.enabled = enabled
+        self._prepared: Dict[Any, set] = {}
+        self._lock = threading.Lock()
+        self._stats = {'prepares': 0, 'reprepares': 0, 'executes': 0, 'plain': 0, 'fallbacks': 0}
+    
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+    
+    def _prepare(self, cur, name: str, sql: str, param_count: int) -> None:
+        positional = sql
+        for position in range(1, param_count + 1):
+            positional = positional.replace('%s', f'${position}', 1)
+        cur.execute(f'PREPARE {name} AS {positional}')
+        self._count('prepares')
+    
+    def execute(self, cur, name: str, params: Tuple[Any, ...]) -> None:
+        """Выполнение запроса по имени; вызывать только для чтения в начале транзакции"""
+        sql = self.queries[name]
+        if not self.enabled:
+            self._count('plain')
+            cur.execute(sql, params)
+            return
+        
+        conn = cur.connection
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+        try:
+            if name not in prepared:
+                self._prepare(cur, name, sql, len(params))
+                prepared.add(name)
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+            self._count('executes')
+        except psycopg2.Error as e:
+            if e.pgcode == PREPARED_PLAN_CHANGED and name in prepared:
+                # ALTER TABLE изменил тип результата: план на подключении устарел, готовим запрос заново
+                conn.rollback()
+                cur.execute(f'DEALLOCATE {name}')
+                self._prepare(cur, name, sql, len(params))
+                self._count('reprepares')
+                cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+                self._count('executes')
+                return
+            if e.pgcode not in PREPARED_STATEMENT_ERRORS:
+                raise
+            # Пулер в режиме транзакций отдает другой backend: подготовленные запросы недоступны
+            conn.rollback()
+            self.enabled = False
+            self._count('fallbacks')
+            print(json.dumps({'event': 'prepared_statements_disabled', 'statement': name, 'pgcode': e.pgcode}))
+            cur.execute(sql, params)
+    
+    def forget(self, conn) -> None:
+        """Подключение закрыто: его подготовленные запросы больше не существуют"""
+        with self._lock:
+            self._prepared.pop(conn, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'enabled': self.enabled, 'connections': len(self._prepared)}
+
+STATEMENTS = StatementRegistry({
+    'doctor_version': "SELECT updated_at FROM doctors WHERE id = %s",
+    'doctor_by_id': "SELECT *, updated_at AS version FROM doctors WHERE id = %s"
+}, DB_PREPARED_STATEMENTS)
+
+def json_default(value: Any) -> Any:
+    """Сериализация datetime/date/Decimal без промежуточных копий строк"""
+    encoder = JSON_FAST_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Тип {type(value).__name__} не поддерживается')
+    return encoder(value)
+
+JSON_ENCODER = json.JSONEncoder(default=json_default)
+
+def to_json(data: Any) -> str:
+    """Кодирование ответа (включая строки курсора) напрямую в тело ответа"""
+    with Span('serialize'):
+        return JSON_ENCODER.encode(data)
+
+def cast_iso_datetime(value: Optional[str], cur) -> Optional[str]:
+    return value.replace(' ', 'T', 1) if value is not None else None
+
+def cast_float(value: Optional[str], cur) -> Optional[float]:
+    return float(value) if value is not None else None
+
+JSON_READY_CASTS: List[Any] = []
+
+def register_json_casts(cur) -> None:
+    """Даты и NUMERIC приходят из драйвера сразу в виде JSON-совместимых значений (только для чтения)"""
+    if not JSON_READY_CASTS:
+        JSON_READY_CASTS.extend([
+            psycopg2.extensions.new_type((1082, 1114), 'ISO_DATETIME', cast_iso_datetime),
+            psycopg2.extensions.new_type((1700,), 'NUMERIC_FLOAT', cast_float)
+        ])
+    for cast in JSON_READY_CASTS:
+        psycopg2.extensions.register_type(cast, cur)
+
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+
+class VerifiedTokenCache:
+    """LRU-кеш проверенных токенов: ключ - SHA-256 токена, значение - payload до момента exp"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+    
+    def _key(self, token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Payload ранее проверенного токена или None"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return payload
+    
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """Сохранение payload успешно проверенного токена (только токены с exp)"""
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)):
+            return
+        
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики и доля попаданий кеша"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+TOKEN_CACHE = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+REVOCATION_FULL_RELOAD_INTERVAL = float(os.environ.get('REVOCATION_FULL_RELOAD_INTERVAL', '600'))
+REVOCATION_BLOOM_BITS = int(os.environ.get('REVOCATION_BLOOM_BITS', str(1 << 16)))
+REVOCATION_BLOOM_HASHES = 4
+
+REVOKED_TOKENS_SQL = """
+    SELECT id, jti, admin_id, EXTRACT(EPOCH FROM revoked_at)::float8 AS revoked_at
+    FROM revoked_tokens
+    WHERE id > %s AND expires_at > now()
+    ORDER BY id
+"""
+
+class RevocationFilter:
+    """Отозванные токены администраторов в памяти: фильтр Блума отсекает почти все проверки, точное множество
+    подтверждает попадание. revoked_tokens дочитывается раз в refresh_interval, а не на каждый запрос"""
+    
+    def __init__(self, refresh_interval: float, full_reload_interval: float, bloom_bits: int):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.bloom_bits = bloom_bits
+        self._bloom = bytearray((bloom_bits + 7) // 8)
+        self._jtis: set = set()
+        self._admins: Dict[int, float] = {}
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats = {'checks': 0, 'bloom_hits': 0, 'false_positives': 0, 'revoked': 0, 'refreshes': 0, 'errors': 0}
+    
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        return [int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % self.bloom_bits for i in range(REVOCATION_BLOOM_HASHES)]
+    
+    def _add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bloom[position >> 3] |= 1 << (position & 7)
+    
+    def _might_contain(self, key: str) -> bool:
+        return all(self._bloom[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+    
+    def _apply(self, jti: Optional[str], admin_id: Optional[int], revoked_at: float) -> None:
+        if jti:
+            self._jtis.add(jti)
+            self._add(jti)
+        elif admin_id is not None:
+            self._admins[admin_id] = max(revoked_at, self._admins.get(admin_id, 0.0))
+            self._add(f'admin:{admin_id}')
+    
+    def refresh(self) -> None:
+        """Дочитывание новых отзывов; раз в full_reload_interval фильтр строится заново без истекших строк"""
+        now = time.monotonic()
+        if self._refreshed_at and now - self._refreshed_at < self.refresh_interval:
+            return
+        # Первую загрузку ждут все запросы, дальше обновляет один поток, остальные работают по текущему состоянию
+        if not self._refresh_lock.acquire(blocking=not self._reloaded_at):
+            return
+        conn = None
+        try:
+            if self._refreshed_at and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            full = not self._reloaded_at or now - self._reloaded_at >= self.full_reload_interval
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute(REVOKED_TOKENS_SQL, (0 if full else self._last_id,))
+                rows = cur.fetchall()
+            
+            with self._lock:
+                if full:
+                    self._bloom = bytearray(len(self._bloom))
+                    self._jtis = set()
+                    self._admins = {}
+                    self._reloaded_at = now
+                for row_id, jti, admin_id, revoked_at in rows:
+                    self._apply(jti, admin_id, revoked_at)
+                    self._last_id = max(self._last_id, row_id)
+                self._refreshed_at = now
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            # БД недоступна: работаем по последнему загруженному состоянию и повторяем через интервал
+            with self._lock:
+                self._refreshed_at = now
+                self._stats['errors'] += 1
+            print(json.dumps({'event': 'revocations_refresh_failed', 'error': str(e)}))
+        finally:
+            if conn is not None:
+                release_db_connection(conn)
+            self._refresh_lock.release()
+    
+    def remember(self, jti: str) -> None:
+        """Немедленный учет отзыва, записанного этим же процессом"""
+        with self._lock:
+            self._apply(jti, None, 0.0)
+    
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Проверка payload за константное время; запрос к БД только при устаревшем состоянии"""
+        self.refresh()
+        jti = payload.get('jti')
+        admin_id = payload.get('admin_id')
+        with self._lock:
+            self._stats['checks'] += 1
+            if jti and self._might_contain(jti):
+                self._stats['bloom_hits'] += 1
+                if jti in self._jtis:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+            if admin_id is not None and self._might_contain(f'admin:{admin_id}'):
+                self._stats['bloom_hits'] += 1
+                revoked_at = self._admins.get(admin_id)
+                if revoked_at is not None and payload.get('iat', 0) <= revoked_at:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'jtis': len(self._jtis), 'admins': len(self._admins), 'last_id': self._last_id}
+
+REVOKED_TOKENS = RevocationFilter(REVOCATION_REFRESH_INTERVAL, REVOCATION_FULL_RELOAD_INTERVAL, REVOCATION_BLOOM_BITS)
 
 def verify_admin_token(token: str) -> Dict[str, Any]:
-    """Проверка JWT токена администратора"""
-    secret_key = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+    """Проверка JWT токена администратора (повторные токены берутся из кеша без проверки подписи, отзыв проверяется всегда)"""
+    payload = TOKEN_CACHE.get(token)
+    
+    if payload is None:
+        try:
+            with Span('jwt'):
+                payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return {'valid': False, 'error': 'Токен истек'}
+        except jwt.InvalidTokenError:
+            return {'valid': False, 'error': 'Недействительный токен'}
+        TOKEN_CACHE.put(token, payload)
+    
+    if payload.get('user_type') != 'admin':
+        return {'valid': False, 'error': 'Недостаточно прав'}
+    if REVOKED_TOKENS.is_revoked(payload):
+        return {'valid': False, 'error': 'Токен отозван'}
+    return {'valid': True, 'payload': payload}
+
+LIST_PAGE_DEFAULT_LIMIT = 50
+LIST_PAGE_MAX_LIMIT = 200
+
+def encode_cursor(values: List[Any]) -> str:
+    """Кодирование ключа сортировки последней строки в непрозрачный курсор"""
+    raw = json.dumps([
+        v.isoformat() if isinstance(v, datetime) else str(v) if isinstance(v, Decimal) else v
+        for v in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, key_size: int) -> List[Any]:
+    """Разбор курсора, полученного от клиента"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(values, list) or len(values) != key_size:
+        raise ValueError('Некорректный курсор')
+    
+    # Ключ курсора: [rank,] created_at, id; значения проверяются и приводятся к типам до подстановки в запрос
+    *ranks, created_at, row_id = values
+    if isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(created_at, str):
+        raise ValueError('Некорректный курсор')
+    try:
+        created_at = datetime.fromisoformat(created_at)
+    except ValueError:
+        raise ValueError('Некорректный курсор')
+    
+    parsed_ranks = []
+    for rank in ranks:
+        if isinstance(rank, bool) or not isinstance(rank, (int, float, str)):
+            raise ValueError('Некорректный курсор')
+        try:
+            rank = Decimal(str(rank))
+        except ArithmeticError:
+            raise ValueError('Некорректный курсор')
+        if not rank.is_finite() or not 0 <= rank <= 1:
+            raise ValueError('Некорректный курсор')
+        parsed_ranks.append(rank)
+    
+    return parsed_ranks + [created_at, row_id]
+
+def parse_page_params(filters: Dict[str, Any], key_size: int) -> Tuple[Optional[int], Optional[List[Any]]]:
+    """Параметры постраничной выборки: limit и курсор after (без них - весь список)"""
+    if not filters.get('limit') and not filters.get('after'):
+        return None, None
     
     try:
-        payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-        if payload.get('user_type') != 'admin':
-            return {'valid': False, 'error': 'Недостаточно прав'}
-        return {'valid': True, 'payload': payload}
-    except jwt.ExpiredSignatureError:
-        return {'valid': False, 'error': 'Токен истек'}
-    except jwt.InvalidTokenError:
-        return {'valid': False, 'error': 'Недействительный токен'}
+        limit = int(filters.get('limit') or LIST_PAGE_DEFAULT_LIMIT)
+    except ValueError:
+        raise ValueError('Некорректный limit')
+    limit = max(1, min(limit, LIST_PAGE_MAX_LIMIT))
+    
+    after = decode_cursor(filters['after'], key_size) if filters.get('after') else None
+    return limit, after
+
+def escape_like(term: str) -> str:
+    """Экранирование спецсимволов шаблона LIKE"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_search(term: str, columns: List[str], conditions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Поиск подстроки по GIN-индексам pg_trgm и выражение релевантности для сортировки"""
+    conditions = conditions or [f"{column} ILIKE %s" for column in columns]
+    pattern = f"%{escape_like(term)}%"
+    similarities = ', '.join(f"word_similarity(%s, {column})" for column in columns)
+    return {
+        'where': f"({' OR '.join(conditions)})",
+        'where_params': [pattern] * len(conditions),
+        'rank': f"ROUND(GREATEST({similarities})::numeric, 4)",
+        'rank_params': [term] * len(columns)
+    }
+
+DOCTOR_LIST_FIELDS = (
+    'id', 'full_name', 'specialty', 'workplace', 'workplace_type',
+    'experience_years', 'photo_url', 'prepayment_amount',
+    'status', 'rating', 'successful_visits_count', 'created_at'
+)
+
+DOCTOR_DETAIL_FIELDS = DOCTOR_LIST_FIELDS + (
+    'description', 'price_includes', 'main_education', 'residency', 'additional_education',
+    'skills', 'work_directions', 'achievements', 'academic_degrees', 'publications',
+    'professional_societies', 'services_provided', 'consultation_types', 'available_dates',
+    'updated_at'
+)
+
+def parse_fields(requested: Optional[str], whitelist: Tuple[str, ...]) -> Optional[List[str]]:
+    """Поля из параметра fields=a,b,c (None - полный набор); ValueError для полей вне белого списка"""
+    if not requested:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in whitelist]
+    if unknown:
+        raise ValueError(f"Недопустимые поля: {', '.join(unknown)}")
+    if not names:
+        raise ValueError('Параметр fields не содержит полей')
+    return names
+
+def drop_hidden_fields(rows: List[Dict[str, Any]], hidden: List[str]) -> None:
+    """Удаление служебных колонок (ключи курсора), которые клиент не запрашивал"""
+    if hidden:
+        for row in rows:
+            for name in hidden:
+                del row[name]
 
 def get_doctors_list(filters: Dict[str, Any]) -> Dict[str, Any]:
     """Получение списка врачей с фильтрами"""
+    try:
+        limit, after = parse_page_params(filters, 3 if filters.get('search') else 2)
+        fields = parse_fields(filters.get('fields'), DOCTOR_LIST_FIELDS)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': str(e)})
+        }
+    
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = """
-                SELECT 
-                    id, full_name, specialty, workplace, workplace_type,
-                    experience_years, photo_url, prepayment_amount,
-                    status, rating, successful_visits_count, created_at
-                FROM doctors
-                WHERE 1=1
-            """
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            search = None
+            rank_column = ''
             params = []
             
+            if filters.get('search'):
+                search = build_search(filters['search'], ['full_name', 'specialty', 'workplace'])
+                rank_column = f", {search['rank']} AS search_rank"
+                params.extend(search['rank_params'])
+            
+            hidden = [key for key in ('created_at', 'id') if fields and key not in fields]
+            columns = ', '.join((fields or list(DOCTOR_LIST_FIELDS)) + hidden)
+            query = f"SELECT {columns}{rank_column} FROM doctors WHERE 1=1"
+            
             if filters.get('status'):
                 query += " AND status = %s"
                 params.append(filters['status'])
             
-            if filters.get('search'):
-                query += " AND (full_name ILIKE %s OR specialty ILIKE %s OR workplace ILIKE %s)"
-                search_term = f"%{filters['search']}%"
-                params.extend([search_term, search_term, search_term])
+            if search:
+                query += f" AND {search['where']}"
+                params.extend(search['where_params'])
+            
+            if after and search:
+                query += f" AND ({search['rank']}, created_at, id) < (%s::numeric, %s::timestamp, %s)"
+                params.extend(search['rank_params'] + after)
+            elif after:
+                query += " AND (created_at, id) < (%s::timestamp, %s)"
+                params.extend(after)
             
-            query += " ORDER BY created_at DESC"
+            if search:
+                query += " ORDER BY search_rank DESC, created_at DESC, id DESC"
+            else:
+                query += " ORDER BY created_at DESC, id DESC"
+            
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit + 1)
             
             cur.execute(query, params)
             doctors = cur.fetchall()
             
-            doctors_list = []
-            for doctor in doctors:
-                doctor_dict = dict(doctor)
-                if doctor_dict.get('created_at'):
-                    doctor_dict['created_at'] = doctor_dict['created_at'].isoformat()
-                if doctor_dict.get('rating'):
-                    doctor_dict['rating'] = float(doctor_dict['rating'])
-                doctors_list.append(doctor_dict)
+            next_cursor = None
+            if limit and len(doctors) > limit:
+                doctors = doctors[:limit]
+                last = doctors[-1]
+                cursor_key = [last['created_at'], last['id']]
+                next_cursor = encode_cursor([last['search_rank']] + cursor_key if search else cursor_key)
+            
+            drop_hidden_fields(doctors, hidden)
             
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'isBase64Encoded': False,
-                'body': json.dumps({
+                'body': to_json({
                     'success': True,
-                    'doctors': doctors_list,
-                    'total': len(doctors_list)
+                    'doctors': doctors,
+                    'total': len(doctors),
+                    'next_cursor': next_cursor
                 })
             }
     except Exception as e:
@@ -88,14 +765,62 @@ def get_doctors_list(filters: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка получения списка: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+def build_etag(kind: str, record_id: int, versions: List[Any]) -> str:
+    """Слабый ETag записи по id и updated_at (включая связанные записи): один тег на несжатое и gzip/br тело"""
+    raw = f"{kind}:{record_id}:" + '|'.join(str(version) for version in versions)
+    return 'W/"' + hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение ETag с заголовком If-None-Match (список или *)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    opaque = etag.removeprefix('W/')
+    return '*' in candidates or any(candidate.removeprefix('W/') == opaque for candidate in candidates)
+
+def not_modified_response(etag: str) -> Dict[str, Any]:
+    """Ответ 304 без тела для актуальной версии у клиента"""
+    return {
+        'statusCode': 304,
+        'headers': {
+            'ETag': etag,
+            'Cache-Control': 'private, no-cache',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'ETag'
+        },
+        'isBase64Encoded': False,
+        'body': ''
+    }
 
-def get_doctor_details(doctor_id: int) -> Dict[str, Any]:
-    """Получение полной информации о враче"""
+def get_doctor_details(doctor_id: int, if_none_match: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Получение информации о враче (только запрошенные поля; 304, если версия у клиента актуальна)"""
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM doctors WHERE id = %s", (doctor_id,))
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            
+            if if_none_match:
+                STATEMENTS.execute(cur, 'doctor_version', (doctor_id,))
+                versions = cur.fetchone()
+                
+                if not versions:
+                    return {
+                        'statusCode': 404,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'isBase64Encoded': False,
+                        'body': json.dumps({'error': 'Врач не найден'})
+                    }
+                
+                etag = build_etag('doctor', doctor_id, [versions['updated_at']] + (fields or []))
+                if etag_matches(if_none_match, etag):
+                    return not_modified_response(etag)
+            
+            if fields:
+                cur.execute(f"SELECT {', '.join(fields)}, updated_at AS version FROM doctors WHERE id = %s", (doctor_id,))
+            else:
+                STATEMENTS.execute(cur, 'doctor_by_id', (doctor_id,))
             doctor = cur.fetchone()
             
             if not doctor:
@@ -106,21 +831,70 @@ def get_doctor_details(doctor_id: int) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Врач не найден'})
                 }
             
-            doctor_dict = dict(doctor)
-            if doctor_dict.get('created_at'):
-                doctor_dict['created_at'] = doctor_dict['created_at'].isoformat()
-            if doctor_dict.get('updated_at'):
-                doctor_dict['updated_at'] = doctor_dict['updated_at'].isoformat()
-            if doctor_dict.get('rating'):
-                doctor_dict['rating'] = float(doctor_dict['rating'])
+            etag = build_etag('doctor', doctor_id, [doctor.pop('version')] + (fields or []))
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'ETag': etag,
+                    'Cache-Control': 'private, no-cache',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Expose-Headers': 'ETag'
+                },
+                'isBase64Encoded': False,
+                'body': to_json({
+                    'success': True,
+                    'doctor': doctor
+                })
+            }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка получения данных: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
+
+MULTI_GET_MAX_IDS = int(os.environ.get('MULTI_GET_MAX_IDS', '100'))
+
+def parse_ids(value: str) -> List[int]:
+    """Список id из параметра ids=1,2,3 без повторов, в порядке запроса"""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise ValueError('Параметр ids должен содержать числа через запятую')
+    if not ids:
+        raise ValueError('Параметр ids не содержит id')
+    if len(ids) > MULTI_GET_MAX_IDS:
+        raise ValueError(f'Не более {MULTI_GET_MAX_IDS} id за один запрос')
+    return ids
+
+def get_doctors_by_ids(ids: List[int], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Пакетное получение врачей одним запросом id = ANY: порядок как в запросе, отсутствующие id в missing"""
+    hidden = [] if not fields or 'id' in fields else ['id']
+    columns = ', '.join(fields + hidden) if fields else '*'
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            cur.execute(f"SELECT {columns} FROM doctors WHERE id = ANY(%s)", (ids,))
+            found = {row['id']: row for row in cur.fetchall()}
+            
+            doctors = [found[doctor_id] for doctor_id in ids if doctor_id in found]
+            drop_hidden_fields(doctors, hidden)
             
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'isBase64Encoded': False,
-                'body': json.dumps({
+                'body': to_json({
                     'success': True,
-                    'doctor': doctor_dict
+                    'doctors': doctors,
+                    'missing': [doctor_id for doctor_id in ids if doctor_id not in found]
                 })
             }
     except Exception as e:
@@ -131,13 +905,123 @@ def get_doctor_details(doctor_id: int) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка получения данных: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+AVAILABILITY_MAX_RANGE_DAYS = 92
+
+def parse_available_date(value: Any) -> Optional[date]:
+    """Дата из элемента available_dates (YYYY-MM-DD или ISO-время) или None для свободного текста.
+    available_dates хранится как есть; нераспознанные элементы просто не попадают в doctor_availability"""
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+def sync_doctor_availability(cur, doctor_ids: List[int]) -> None:
+    """Пересборка нормализованных слотов doctor_availability из doctors.available_dates.
+    Даты разбираются в Python: старые записи со свободным текстом или несуществующими датами пропускаются"""
+    cur.execute(
+        "SELECT id, specialty, workplace_type, available_dates FROM doctors WHERE id = ANY(%s)",
+        (doctor_ids,)
+    )
+    slots = []
+    for doctor in cur.fetchall():
+        stored = doctor['available_dates'] if isinstance(doctor['available_dates'], list) else []
+        for available_date in {parse_available_date(item) for item in stored} - {None}:
+            slots.append((doctor['id'], available_date, doctor['specialty'], doctor['workplace_type']))
+    
+    cur.execute("DELETE FROM doctor_availability WHERE doctor_id = ANY(%s)", (doctor_ids,))
+    if slots:
+        psycopg2_extras.execute_values(
+            cur,
+            "INSERT INTO doctor_availability (doctor_id, available_date, specialty, workplace_type) VALUES %s",
+            slots,
+            page_size=1000
+        )
+
+def get_doctors_availability(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Свободные слоты врачей на диапазон дат с учетом подтвержденных заявок"""
+    try:
+        date_from = date.fromisoformat(filters.get('date_from', ''))
+        date_to = date.fromisoformat(filters.get('date_to') or filters['date_from'])
+    except (KeyError, ValueError):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'Необходимы date_from и date_to в формате YYYY-MM-DD'})
+        }
+    
+    if date_to < date_from or (date_to - date_from).days > AVAILABILITY_MAX_RANGE_DAYS:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Диапазон дат должен быть от 1 до {AVAILABILITY_MAX_RANGE_DAYS} дней'})
+        }
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            query = """
+                SELECT
+                    a.doctor_id, a.available_date,
+                    a.capacity - COALESCE(b.booked, 0) AS free_slots,
+                    d.full_name, d.specialty, d.workplace, d.workplace_type,
+                    d.rating, d.photo_url, d.prepayment_amount
+                FROM doctor_availability a
+                JOIN doctors d ON d.id = a.doctor_id AND d.status = 'active'
+                LEFT JOIN (
+                    SELECT doctor_id, visit_date, COUNT(*) AS booked
+                    FROM orders
+                    WHERE status = 'confirmed' AND doctor_id IS NOT NULL
+                        AND visit_date BETWEEN %s AND %s
+                    GROUP BY doctor_id, visit_date
+                ) b ON b.doctor_id = a.doctor_id AND b.visit_date = a.available_date
+                WHERE a.available_date BETWEEN %s AND %s
+                    AND a.capacity > COALESCE(b.booked, 0)
+            """
+            params = [date_from, date_to, date_from, date_to]
+            
+            if filters.get('specialty'):
+                query += " AND a.specialty = %s"
+                params.append(filters['specialty'])
+            
+            if filters.get('workplace_type'):
+                query += " AND a.workplace_type = %s"
+                params.append(filters['workplace_type'])
+            
+            query += " ORDER BY a.available_date, d.rating DESC NULLS LAST, a.doctor_id"
+            
+            cur.execute(query, params)
+            slots = cur.fetchall()
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': to_json({
+                    'success': True,
+                    'slots': slots,
+                    'total': len(slots)
+                })
+            }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка поиска свободных врачей: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
 
 def create_doctor(data: Dict[str, Any]) -> Dict[str, Any]:
     """Создание нового врача"""
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
             cur.execute("""
                 INSERT INTO doctors (
                     full_name, specialty, workplace, workplace_type,
@@ -145,10 +1029,10 @@ def create_doctor(data: Dict[str, Any]) -> Dict[str, Any]:
                     price_includes, main_education, residency, additional_education,
                     skills, work_directions, achievements, academic_degrees,
                     publications, professional_societies, services_provided,
-                    consultation_types, status, created_at, updated_at
+                    consultation_types, available_dates, status, created_at, updated_at
                 ) VALUES (
                     %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s, %s, %s, %s, %s, %s, %s
+                    %s, %s, %s, %s, %s, %s, %s, %s
                 )
                 RETURNING id, full_name, specialty
             """, (
@@ -172,12 +1056,15 @@ def create_doctor(data: Dict[str, Any]) -> Dict[str, Any]:
                 json.dumps(data.get('professional_societies')) if data.get('professional_societies') else None,
                 json.dumps(data.get('services_provided')) if data.get('services_provided') else None,
                 json.dumps(data.get('consultation_types')) if data.get('consultation_types') else None,
+                json.dumps(data.get('available_dates')) if data.get('available_dates') else None,
                 data.get('status', 'active'),
                 datetime.now(),
                 datetime.now()
             ))
             
             new_doctor = cur.fetchone()
+            if data.get('available_dates'):
+                sync_doctor_availability(cur, [new_doctor['id']])
             conn.commit()
             
             return {
@@ -199,13 +1086,13 @@ def create_doctor(data: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка создания врача: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 def update_doctor(doctor_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
     """Обновление данных врача"""
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
             update_fields = []
             params = []
             
@@ -225,7 +1112,8 @@ def update_doctor(doctor_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
             jsonb_fields = [
                 'main_education', 'residency', 'additional_education', 'skills',
                 'work_directions', 'achievements', 'academic_degrees', 'publications',
-                'professional_societies', 'services_provided', 'consultation_types'
+                'professional_societies', 'services_provided', 'consultation_types',
+                'available_dates'
             ]
             
             for key, db_field in field_mapping.items():
@@ -263,6 +1151,8 @@ def update_doctor(doctor_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Врач не найден'})
                 }
             
+            if any(field in data for field in ('available_dates', 'specialty', 'workplace_type')):
+                sync_doctor_availability(cur, [doctor_id])
             conn.commit()
             
             return {
@@ -284,13 +1174,218 @@ def update_doctor(doctor_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка обновления: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+DOCTOR_JSONB_FIELDS = [
+    'main_education', 'residency', 'additional_education', 'skills',
+    'work_directions', 'achievements', 'academic_degrees', 'publications',
+    'professional_societies', 'services_provided', 'consultation_types',
+    'available_dates'
+]
+DOCTOR_IMPORT_COLUMNS = {
+    'full_name': 'VARCHAR(255)',
+    'specialty': 'VARCHAR(255)',
+    'workplace': 'VARCHAR(500)',
+    'workplace_type': 'VARCHAR(50)',
+    'experience_years': 'INTEGER',
+    'photo_url': 'TEXT',
+    'description': 'TEXT',
+    'prepayment_amount': 'INTEGER',
+    'price_includes': 'TEXT',
+    **{field: 'JSONB' for field in DOCTOR_JSONB_FIELDS},
+    'status': 'VARCHAR(20)'
+}
+DOCTOR_IMPORT_MERGE_KEY = {'full_name': 255, 'specialty': 255, 'workplace': 500}
+# Значения по умолчанию только для новых врачей: при обновлении пустое поле сохраняет текущее значение
+DOCTOR_IMPORT_INSERT_DEFAULTS = {'experience_years': '0', 'prepayment_amount': '0', 'status': "'active'"}
+IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', '20000'))
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+def iter_import_records(payload: str, import_format: str) -> Iterator[Tuple[int, Any]]:
+    """Построчное чтение NDJSON или CSV: (номер строки, запись или текст ошибки)"""
+    if import_format == 'csv':
+        reader = csv.DictReader(io.StringIO(payload))
+        for record in reader:
+            yield reader.line_num, record
+        return
+    
+    for line_no, line in enumerate(payload.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, 'Некорректный JSON'
+
+def normalize_import_record(record: Any) -> Tuple[Optional[List[Any]], Optional[str]]:
+    """Проверка и приведение записи импорта к колонкам staging-таблицы"""
+    if not isinstance(record, dict):
+        return None, record if isinstance(record, str) else 'Запись должна быть объектом'
+    
+    row = []
+    for column, column_type in DOCTOR_IMPORT_COLUMNS.items():
+        value = record.get(column)
+        if value == '':
+            value = None
+        
+        if column in DOCTOR_IMPORT_MERGE_KEY:
+            if not value or not isinstance(value, str):
+                return None, f'Поле {column} обязательно'
+            max_length = DOCTOR_IMPORT_MERGE_KEY[column]
+            if len(value) > max_length:
+                return None, f'Поле {column} длиннее {max_length} символов'
+        elif column in ('experience_years', 'prepayment_amount'):
+            if value is not None:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    return None, f'Поле {column} должно быть целым числом'
+                if value < 0:
+                    return None, f'Поле {column} не может быть отрицательным'
+        elif column == 'workplace_type':
+            if value not in (None, 'federal', 'private'):
+                return None, 'workplace_type должен быть federal или private'
+        elif column == 'status':
+            if value not in (None, 'active', 'inactive'):
+                return None, 'status должен быть active или inactive'
+        elif column_type == 'JSONB' and value is not None:
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    return None, f'Поле {column} должно содержать JSON-массив'
+            if not isinstance(value, list):
+                return None, f'Поле {column} должно быть массивом'
+            value = json.dumps(value, ensure_ascii=False)
+        
+        row.append(value)
+    
+    return row, None
+
+def import_doctors(payload: Any, import_format: str) -> Dict[str, Any]:
+    """Массовый импорт врачей: проверка в один проход, COPY в staging-таблицу и слияние одним запросом"""
+    if not isinstance(payload, str) or not payload.strip() or import_format not in ('ndjson', 'csv'):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'Необходимы data (текст) и format: ndjson или csv'})
+        }
+    
+    copy_buffer = io.StringIO()
+    copy_writer = csv.writer(copy_buffer)
+    errors = []
+    error_count = 0
+    valid_count = 0
+    seen_keys = set()
+    
+    for line_no, record in iter_import_records(payload, import_format):
+        row, error = normalize_import_record(record)
+        if row is not None:
+            merge_key = tuple(row[:len(DOCTOR_IMPORT_MERGE_KEY)])
+            if merge_key in seen_keys:
+                row, error = None, 'Врач повторяется в файле импорта'
+            seen_keys.add(merge_key)
+        
+        if row is None:
+            error_count += 1
+            if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                errors.append({'line': line_no, 'error': error})
+            continue
+        
+        valid_count += 1
+        if valid_count > IMPORT_MAX_ROWS:
+            return {
+                'statusCode': 413,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': json.dumps({'error': f'Не более {IMPORT_MAX_ROWS} врачей за один импорт'})
+            }
+        copy_writer.writerow([line_no] + row)
+    
+    inserted_count = 0
+    updated_count = 0
+    
+    if valid_count:
+        columns = list(DOCTOR_IMPORT_COLUMNS)
+        key_match = ' AND '.join(f"d.{column} = i.{column}" for column in DOCTOR_IMPORT_MERGE_KEY)
+        update_assignments = ', '.join(
+            f"{column} = COALESCE(i.{column}, d.{column})"
+            for column in columns if column not in DOCTOR_IMPORT_MERGE_KEY
+        )
+        insert_values = ', '.join(
+            f"COALESCE(i.{column}, {DOCTOR_IMPORT_INSERT_DEFAULTS[column]})" if column in DOCTOR_IMPORT_INSERT_DEFAULTS else f"i.{column}"
+            for column in columns
+        )
+        
+        conn = get_db_connection()
+        try:
+            with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+                column_definitions = ', '.join(f"{column} {column_type}" for column, column_type in DOCTOR_IMPORT_COLUMNS.items())
+                cur.execute(f"CREATE TEMP TABLE doctors_import (line_no INTEGER, {column_definitions}) ON COMMIT DROP")
+                
+                copy_buffer.seek(0)
+                cur.copy_expert(
+                    f"COPY doctors_import (line_no, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                    copy_buffer
+                )
+                
+                now = datetime.now()
+                cur.execute(f"""
+                    WITH updated AS (
+                        UPDATE doctors d SET {update_assignments}, updated_at = %s
+                        FROM doctors_import i
+                        WHERE {key_match}
+                        RETURNING i.line_no, d.id
+                    ),
+                    inserted AS (
+                        INSERT INTO doctors ({', '.join(columns)}, created_at, updated_at)
+                        SELECT {insert_values}, %s, %s
+                        FROM doctors_import i
+                        WHERE NOT EXISTS (SELECT 1 FROM updated u WHERE u.line_no = i.line_no)
+                        RETURNING id
+                    )
+                    SELECT
+                        (SELECT COUNT(*) FROM updated) AS updated_count,
+                        (SELECT COUNT(*) FROM inserted) AS inserted_count,
+                        ARRAY(SELECT id FROM updated UNION ALL SELECT id FROM inserted) AS doctor_ids
+                """, (now, now, now))
+                
+                merge_result = cur.fetchone()
+                sync_doctor_availability(cur, merge_result['doctor_ids'])
+                conn.commit()
+                updated_count = merge_result['updated_count']
+                inserted_count = merge_result['inserted_count']
+        except Exception as e:
+            conn.rollback()
+            return {
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': json.dumps({'error': f'Ошибка импорта: {str(e)}'})
+            }
+        finally:
+            release_db_connection(conn)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'isBase64Encoded': False,
+        'body': json.dumps({
+            'success': error_count == 0,
+            'message': f'Импортировано врачей: {inserted_count + updated_count}',
+            'inserted': inserted_count,
+            'updated': updated_count,
+            'rejected': error_count,
+            'errors': errors
+        })
+    }
 
 def delete_doctor(doctor_id: int) -> Dict[str, Any]:
     """Удаление врача"""
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
             cur.execute("DELETE FROM doctors WHERE id = %s RETURNING id, full_name", (doctor_id,))
             deleted_doctor = cur.fetchone()
             
@@ -322,9 +1417,113 @@ def delete_doctor(doctor_id: int) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка удаления: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1400'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+COMPRESSION_STATS = {'compressed': 0, 'skipped_small': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0}
+COMPRESSION_LOCK = threading.Lock()
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Кодировки из Accept-Encoding с их q-весами"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        accepted[name.strip().lower()] = weight
+    return accepted
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """Лучшая поддерживаемая кодировка: br (если установлен brotli), затем gzip"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = (['br'] if brotli else []) + ['gzip']
+    best = max(candidates, key=lambda name: accepted.get(name, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """Сжатие тела ответа по Accept-Encoding, если оно больше COMPRESSION_MIN_BYTES"""
+    body = response.get('body')
+    if response.get('statusCode') != 200 or response.get('isBase64Encoded') or not isinstance(body, str):
+        return response
+    
+    headers = event.get('headers') or {}
+    encoding = choose_encoding(headers.get('Accept-Encoding') or headers.get('accept-encoding'))
+    if not encoding:
+        return response
+    
+    raw = body.encode('utf-8')
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        with COMPRESSION_LOCK:
+            COMPRESSION_STATS['skipped_small'] += 1
+        return response
+    
+    started = time.process_time()
+    with Span('compress'):
+        if encoding == 'br':
+            compressed = brotli.compress(raw, quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(raw, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+    cpu_ms = (time.process_time() - started) * 1000
+    ratio = len(compressed) / len(raw)
+    
+    with COMPRESSION_LOCK:
+        COMPRESSION_STATS['compressed'] += 1
+        COMPRESSION_STATS['bytes_in'] += len(raw)
+        COMPRESSION_STATS['bytes_out'] += len(compressed)
+        COMPRESSION_STATS['cpu_ms'] += cpu_ms
+    
+    response_headers = dict(response.get('headers') or {})
+    exposed = response_headers.get('Access-Control-Expose-Headers')
+    response_headers.update({
+        'Content-Encoding': encoding,
+        'Vary': 'Accept-Encoding',
+        'X-Compression': f'{encoding}; ratio={ratio:.3f}; cpu_ms={cpu_ms:.2f}; original={len(raw)}',
+        'Access-Control-Expose-Headers': f'{exposed}, X-Compression' if exposed else 'X-Compression'
+    })
+    return {
+        **response,
+        'headers': response_headers,
+        'isBase64Encoded': True,
+        'body': base64.b64encode(compressed).decode('ascii')
+    }
+
+def compression_stats() -> Dict[str, Any]:
+    """Суммарная степень сжатия и затраты CPU текущего контейнера"""
+    with COMPRESSION_LOCK:
+        stats = dict(COMPRESSION_STATS)
+    stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 4) if stats['bytes_in'] else None
+    stats['cpu_ms'] = round(stats['cpu_ms'], 2)
+    stats['min_bytes'] = COMPRESSION_MIN_BYTES
+    stats['brotli'] = brotli is not None
+    return stats
+
+def get_metrics() -> Dict[str, Any]:
+    """Счетчики производительности текущего контейнера"""
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'isBase64Encoded': False,
+        'body': json.dumps({
+            'success': True,
+            'db_pool': DB_POOL.stats(),
+            'token_cache': TOKEN_CACHE.stats(),
+            'revocations': REVOKED_TOKENS.stats(),
+            'prepared_statements': STATEMENTS.stats(),
+            'compression': compression_stats()
+        })
+    }
+
+def route_request(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
@@ -333,7 +1532,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, If-None-Match',
                 'Access-Control-Max-Age': '86400'
             },
             'isBase64Encoded': False,
@@ -362,15 +1561,48 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     if method == 'GET':
         query_params = event.get('queryStringParameters') or {}
+        
+        if query_params.get('action') == 'metrics':
+            return get_metrics()
+        
+        if query_params.get('action') == 'availability':
+            return get_doctors_availability(query_params)
+        
         doctor_id = query_params.get('id')
         
+        if query_params.get('ids'):
+            try:
+                ids = parse_ids(query_params['ids'])
+                fields = parse_fields(query_params.get('fields'), DOCTOR_DETAIL_FIELDS)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'error': str(e)})
+                }
+            return get_doctors_by_ids(ids, fields)
+        
         if doctor_id:
-            return get_doctor_details(int(doctor_id))
+            try:
+                fields = parse_fields(query_params.get('fields'), DOCTOR_DETAIL_FIELDS)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'error': str(e)})
+                }
+            return get_doctor_details(int(doctor_id), headers.get('If-None-Match') or headers.get('if-none-match'), fields)
         else:
             return get_doctors_list(query_params)
     
     elif method == 'POST':
         body_data = json.loads(event.get('body', '{}'))
+        
+        if body_data.get('action') == 'import':
+            return import_doctors(body_data.get('data'), body_data.get('format', 'ndjson'))
+        
         return create_doctor(body_data)
     
     elif method == 'PUT':
@@ -407,3 +1639,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'isBase64Encoded': False,
         'body': json.dumps({'error': 'Метод не поддерживается'})
     }
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return with_server_timing(event, context, lambda event, context: compress_response(event, route_request(event, context)))
@@ -5,110 +5,824 @@ Args: event - dict with httpMethod, body, queryStringParameters, headers
 Returns: HTTP response dict with orders data or operation status
 '''
 
+import importlib
+import importlib.util
 import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
-from typing import Dict, Any, List
-import jwt
+import hashlib
+import base64
+import gzip
+import csv
+import heapq
+import io
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List, Tuple, Optional, Iterator, TextIO
+
+class LazyModule:
+    """Прокси модуля: импорт выполняется при первом обращении к атрибуту (быстрый холодный старт)"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+psycopg2 = LazyModule('psycopg2')
+psycopg2_extras = LazyModule('psycopg2.extras')
+jwt = LazyModule('jwt')
+brotli = LazyModule('brotli') if importlib.util.find_spec('brotli') else None
+
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING', '1') == '1'
+REQUEST_SPANS: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_spans', default=None)
+TIMED_CURSOR_CLASSES: Dict[Any, Any] = {}
+TIMED_CONNECTION_CLASS: List[Any] = []
+
+class Span:
+    """Замер шага обработки текущего запроса; вне запроса или при SERVER_TIMING=0 ничего не делает"""
+    __slots__ = ('name', 'spans', 'started')
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self) -> 'Span':
+        self.spans = REQUEST_SPANS.get()
+        if self.spans is not None:
+            self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> bool:
+        if self.spans is not None:
+            self.spans[self.name] = self.spans.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+def timed_cursor_class(base):
+    """Подкласс курсора, который замеряет execute и fetch* в спанах db_execute и db_fetch"""
+    timed = TIMED_CURSOR_CLASSES.get(base)
+    if timed is None:
+        class TimedCursor(base):
+            def execute(self, query, vars=None):
+                with Span('db_execute'):
+                    return super().execute(query, vars)
+            
+            def copy_expert(self, sql, file, size=8192):
+                with Span('db_execute'):
+                    return super().copy_expert(sql, file, size)
+            
+            def fetchone(self):
+                with Span('db_fetch'):
+                    return super().fetchone()
+            
+            def fetchmany(self, size=None):
+                with Span('db_fetch'):
+                    return super().fetchmany(size) if size is not None else super().fetchmany()
+            
+            def fetchall(self):
+                with Span('db_fetch'):
+                    return super().fetchall()
+        
+        timed = TIMED_CURSOR_CLASSES[base] = TimedCursor
+    return timed
+
+def timed_connection_class():
+    """Класс подключения, все курсоры которого замеряются"""
+    if not TIMED_CONNECTION_CLASS:
+        class TimedConnection(psycopg2.extensions.connection):
+            def cursor(self, *args, **kwargs):
+                base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+                kwargs['cursor_factory'] = timed_cursor_class(base)
+                return super().cursor(*args, **kwargs)
+        
+        TIMED_CONNECTION_CLASS.append(TimedConnection)
+    return TIMED_CONNECTION_CLASS[0]
+
+def with_server_timing(event: Dict[str, Any], context: Any, route) -> Dict[str, Any]:
+    """Обработка запроса со сбором спанов: заголовок Server-Timing и одна строка лога по request_id"""
+    if not SERVER_TIMING_ENABLED or event.get('httpMethod') == 'OPTIONS':
+        return route(event, context)
+    
+    spans: Dict[str, float] = {}
+    token = REQUEST_SPANS.set(spans)
+    started = time.perf_counter()
+    try:
+        response = route(event, context)
+    finally:
+        REQUEST_SPANS.reset(token)
+    total = time.perf_counter() - started
+    
+    timings = {name: round(seconds * 1000, 2) for name, seconds in spans.items()}
+    timing_header = ', '.join(f'{name};dur={ms}' for name, ms in timings.items())
+    headers = dict(response.get('headers') or {})
+    exposed = headers.get('Access-Control-Expose-Headers')
+    headers.update({
+        'Server-Timing': f"{timing_header + ', ' if timing_header else ''}total;dur={round(total * 1000, 2)}",
+        'Timing-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': f'{exposed}, Server-Timing' if exposed else 'Server-Timing'
+    })
+    print(json.dumps({
+        'event': 'request_timing',
+        'request_id': getattr(context, 'request_id', None),
+        'function': getattr(context, 'function_name', None),
+        'method': event.get('httpMethod'),
+        'action': (event.get('queryStringParameters') or {}).get('action'),
+        'status': response.get('statusCode'),
+        'total_ms': round(total * 1000, 2),
+        'spans': timings
+    }))
+    return {**response, 'headers': headers}
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_WAIT_TIMEOUT', '5'))
+DB_POOL_HEALTHCHECK_AFTER = float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER', '30'))
+
+class ConnectionPool:
+    """Пул подключений к БД, переживающий вызовы в тёплом контейнере"""
+    
+    def __init__(self, max_size: int, wait_timeout: float, healthcheck_after: float):
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.healthcheck_after = healthcheck_after
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'reconnects': 0}
+    
+    def _connect(self):
+        if SERVER_TIMING_ENABLED:
+            return psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=timed_connection_class())
+        return psycopg2.connect(os.environ.get('DATABASE_URL'))
+    
+    def _close_quietly(self, conn) -> None:
+        STATEMENTS.forget(conn)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+    
+    def _discard(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+    
+    def _is_alive(self, conn, idle_since: float) -> bool:
+        """Проверка подключения перед выдачей: пинг только после долгого простоя"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def acquire(self):
+        """Выдача подключения: свободное из пула, новое в пределах лимита или ожидание"""
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._stats['hits'] += 1
+                    break
+                if self._size < self.max_size:
+                    conn, idle_since = None, 0.0
+                    self._size += 1
+                    self._stats['misses'] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise psycopg2.OperationalError('Пул подключений к БД исчерпан')
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+        
+        try:
+            if conn is None:
+                return self._connect()
+            if not self._is_alive(conn, idle_since):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._stats['reconnects'] += 1
+                return self._connect()
+            return conn
+        except Exception:
+            self._discard()
+            raise
+    
+    def release(self, conn) -> None:
+        """Возврат подключения в пул с откатом незавершенной транзакции"""
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close_quietly(conn)
+        
+        if conn.closed:
+            STATEMENTS.forget(conn)
+            self._discard()
+            return
+        
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий/промахов/ожиданий пула"""
+        with self._cond:
+            return {**self._stats, 'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+DB_POOL = ConnectionPool(DB_POOL_MAX_SIZE, DB_POOL_WAIT_TIMEOUT, DB_POOL_HEALTHCHECK_AFTER)
 
 def get_db_connection():
-    """Создание подключения к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url)
+    """Получение подключения к БД из пула"""
+    with Span('db_connect'):
+        return DB_POOL.acquire()
+
+def release_db_connection(conn) -> None:
+    """Возврат подключения в пул вместо закрытия"""
+    DB_POOL.release(conn)
+
+JSON_FAST_ENCODERS = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    Decimal: float
+}
+
+DB_PREPARED_STATEMENTS = os.environ.get('DB_PREPARED_STATEMENTS', '1') == '1'
+PREPARED_STATEMENT_ERRORS = ('26000', '42P05')
+PREPARED_PLAN_CHANGED = '0A000'
+
+class StatementRegistry:
+    """Горячие запросы с неизменным текстом: PREPARE один раз на подключение пула, дальше EXECUTE.
+    При DB_PREPARED_STATEMENTS=0 или за пулером в режиме транзакций выполняются обычным execute"""
+    
+    def __init__(self, queries: Dict[str, str], enabled: bool):
+        self.queries = queries
+        self.enabled = enabled
+        self._prepared: Dict[Any, set] = {}
+        self._lock = threading.Lock()
+        self._stats = {'prepares': 0, 'reprepares': 0, 'executes': 0, 'plain': 0, 'fallbacks': 0}
+    
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+    
+    def _prepare(self, cur, name: str, sql: str, param_count: int) -> None:
+        positional = sql
+        for position in range(1, param_count + 1):
+            positional = positional.replace('%s', f'${position}', 1)
+        cur.execute(f'PREPARE {name} AS {positional}')
+        self._count('prepares')
+    
+    def execute(self, cur, name: str, params: Tuple[Any, ...]) -> None:
+        """Выполнение запроса по имени; вызывать только для чтения в начале транзакции"""
+        sql = self.queries[name]
+        if not self.enabled:
+            self._count('plain')
+            cur.execute(sql, params)
+            return
+        
+        conn = cur.connection
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+        try:
+            if name not in prepared:
+                self._prepare(cur, name, sql, len(params))
+                prepared.add(name)
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+            self._count('executes')
+        except psycopg2.Error as e:
+            if e.pgcode == PREPARED_PLAN_CHANGED and name in prepared:
+                # ALTER TABLE изменил тип результата: план на подключении устарел, готовим запрос заново
+                conn.rollback()
+                cur.execute(f'DEALLOCATE {name}')
+                self._prepare(cur, name, sql, len(params))
+                self._count('reprepares')
+                cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+                self._count('executes')
+                return
+            if e.pgcode not in PREPARED_STATEMENT_ERRORS:
+                raise
+            # Пулер в режиме транзакций отдает другой backend: подготовленные запросы недоступны
+            conn.rollback()
+            self.enabled = False
+            self._count('fallbacks')
+            print(json.dumps({'event': 'prepared_statements_disabled', 'statement': name, 'pgcode': e.pgcode}))
+            cur.execute(sql, params)
+    
+    def forget(self, conn) -> None:
+        """Подключение закрыто: его подготовленные запросы больше не существуют"""
+        with self._lock:
+            self._prepared.pop(conn, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'enabled': self.enabled, 'connections': len(self._prepared)}
+
+def json_default(value: Any) -> Any:
+    """Сериализация datetime/date/Decimal без промежуточных копий строк"""
+    encoder = JSON_FAST_ENCODERS.get(type(value))
+    if encoder is None:
+        raise TypeError(f'Тип {type(value).__name__} не поддерживается')
+    return encoder(value)
+
+JSON_ENCODER = json.JSONEncoder(default=json_default)
+
+def to_json(data: Any) -> str:
+    """Кодирование ответа (включая строки курсора) напрямую в тело ответа"""
+    with Span('serialize'):
+        return JSON_ENCODER.encode(data)
+
+def cast_iso_datetime(value: Optional[str], cur) -> Optional[str]:
+    return value.replace(' ', 'T', 1) if value is not None else None
+
+def cast_float(value: Optional[str], cur) -> Optional[float]:
+    return float(value) if value is not None else None
+
+JSON_READY_CASTS: List[Any] = []
+
+def register_json_casts(cur) -> None:
+    """Даты и NUMERIC приходят из драйвера сразу в виде JSON-совместимых значений (только для чтения)"""
+    if not JSON_READY_CASTS:
+        JSON_READY_CASTS.extend([
+            psycopg2.extensions.new_type((1082, 1114), 'ISO_DATETIME', cast_iso_datetime),
+            psycopg2.extensions.new_type((1700,), 'NUMERIC_FLOAT', cast_float)
+        ])
+    for cast in JSON_READY_CASTS:
+        psycopg2.extensions.register_type(cast, cur)
+
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+
+class VerifiedTokenCache:
+    """LRU-кеш проверенных токенов: ключ - SHA-256 токена, значение - payload до момента exp"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+    
+    def _key(self, token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Payload ранее проверенного токена или None"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return payload
+    
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """Сохранение payload успешно проверенного токена (только токены с exp)"""
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)):
+            return
+        
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики и доля попаданий кеша"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+TOKEN_CACHE = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+REVOCATION_FULL_RELOAD_INTERVAL = float(os.environ.get('REVOCATION_FULL_RELOAD_INTERVAL', '600'))
+REVOCATION_BLOOM_BITS = int(os.environ.get('REVOCATION_BLOOM_BITS', str(1 << 16)))
+REVOCATION_BLOOM_HASHES = 4
+
+REVOKED_TOKENS_SQL = """
+    SELECT id, jti, admin_id, EXTRACT(EPOCH FROM revoked_at)::float8 AS revoked_at
+    FROM revoked_tokens
+    WHERE id > %s AND expires_at > now()
+    ORDER BY id
+"""
+
+class RevocationFilter:
+    """Отозванные токены администраторов в памяти: фильтр Блума отсекает почти все проверки, точное множество
+    подтверждает попадание. revoked_tokens дочитывается раз в refresh_interval, а не на каждый запрос"""
+    
+    def __init__(self, refresh_interval: float, full_reload_interval: float, bloom_bits: int):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.bloom_bits = bloom_bits
+        self._bloom = bytearray((bloom_bits + 7) // 8)
+        self._jtis: set = set()
+        self._admins: Dict[int, float] = {}
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats = {'checks': 0, 'bloom_hits': 0, 'false_positives': 0, 'revoked': 0, 'refreshes': 0, 'errors': 0}
+    
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        return [int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % self.bloom_bits for i in range(REVOCATION_BLOOM_HASHES)]
+    
+    def _add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bloom[position >> 3] |= 1 << (position & 7)
+    
+    def _might_contain(self, key: str) -> bool:
+        return all(self._bloom[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+    
+    def _apply(self, jti: Optional[str], admin_id: Optional[int], revoked_at: float) -> None:
+        if jti:
+            self._jtis.add(jti)
+            self._add(jti)
+        elif admin_id is not None:
+            self._admins[admin_id] = max(revoked_at, self._admins.get(admin_id, 0.0))
+            self._add(f'admin:{admin_id}')
+    
+    def refresh(self) -> None:
+        """Дочитывание новых отзывов; раз в full_reload_interval фильтр строится заново без истекших строк"""
+        now = time.monotonic()
+        if self._refreshed_at and now - self._refreshed_at < self.refresh_interval:
+            return
+        # Первую загрузку ждут все запросы, дальше обновляет один поток, остальные работают по текущему состоянию
+        if not self._refresh_lock.acquire(blocking=not self._reloaded_at):
+            return
+        conn = None
+        try:
+            if self._refreshed_at and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            full = not self._reloaded_at or now - self._reloaded_at >= self.full_reload_interval
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute(REVOKED_TOKENS_SQL, (0 if full else self._last_id,))
+                rows = cur.fetchall()
+            
+            with self._lock:
+                if full:
+                    self._bloom = bytearray(len(self._bloom))
+                    self._jtis = set()
+                    self._admins = {}
+                    self._reloaded_at = now
+                for row_id, jti, admin_id, revoked_at in rows:
+                    self._apply(jti, admin_id, revoked_at)
+                    self._last_id = max(self._last_id, row_id)
+                self._refreshed_at = now
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            # БД недоступна: работаем по последнему загруженному состоянию и повторяем через интервал
+            with self._lock:
+                self._refreshed_at = now
+                self._stats['errors'] += 1
+            print(json.dumps({'event': 'revocations_refresh_failed', 'error': str(e)}))
+        finally:
+            if conn is not None:
+                release_db_connection(conn)
+            self._refresh_lock.release()
+    
+    def remember(self, jti: str) -> None:
+        """Немедленный учет отзыва, записанного этим же процессом"""
+        with self._lock:
+            self._apply(jti, None, 0.0)
+    
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Проверка payload за константное время; запрос к БД только при устаревшем состоянии"""
+        self.refresh()
+        jti = payload.get('jti')
+        admin_id = payload.get('admin_id')
+        with self._lock:
+            self._stats['checks'] += 1
+            if jti and self._might_contain(jti):
+                self._stats['bloom_hits'] += 1
+                if jti in self._jtis:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+            if admin_id is not None and self._might_contain(f'admin:{admin_id}'):
+                self._stats['bloom_hits'] += 1
+                revoked_at = self._admins.get(admin_id)
+                if revoked_at is not None and payload.get('iat', 0) <= revoked_at:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'jtis': len(self._jtis), 'admins': len(self._admins), 'last_id': self._last_id}
+
+REVOKED_TOKENS = RevocationFilter(REVOCATION_REFRESH_INTERVAL, REVOCATION_FULL_RELOAD_INTERVAL, REVOCATION_BLOOM_BITS)
 
 def verify_admin_token(token: str) -> Dict[str, Any]:
-    """Проверка JWT токена администратора"""
-    secret_key = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+    """Проверка JWT токена администратора (повторные токены берутся из кеша без проверки подписи, отзыв проверяется всегда)"""
+    payload = TOKEN_CACHE.get(token)
+    
+    if payload is None:
+        try:
+            with Span('jwt'):
+                payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return {'valid': False, 'error': 'Токен истек'}
+        except jwt.InvalidTokenError:
+            return {'valid': False, 'error': 'Недействительный токен'}
+        TOKEN_CACHE.put(token, payload)
     
+    if payload.get('user_type') != 'admin':
+        return {'valid': False, 'error': 'Недостаточно прав'}
+    if REVOKED_TOKENS.is_revoked(payload):
+        return {'valid': False, 'error': 'Токен отозван'}
+    return {'valid': True, 'payload': payload}
+
+LIST_PAGE_DEFAULT_LIMIT = 50
+LIST_PAGE_MAX_LIMIT = 200
+
+def encode_cursor(values: List[Any]) -> str:
+    """Кодирование ключа сортировки последней строки в непрозрачный курсор"""
+    raw = json.dumps([
+        v.isoformat() if isinstance(v, datetime) else str(v) if isinstance(v, Decimal) else v
+        for v in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, key_size: int) -> List[Any]:
+    """Разбор курсора, полученного от клиента"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(values, list) or len(values) != key_size:
+        raise ValueError('Некорректный курсор')
+    
+    # Ключ курсора: [rank,] created_at, id; значения проверяются и приводятся к типам до подстановки в запрос
+    *ranks, created_at, row_id = values
+    if isinstance(row_id, bool) or not isinstance(row_id, int):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(created_at, str):
+        raise ValueError('Некорректный курсор')
     try:
-        payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-        if payload.get('user_type') != 'admin':
-            return {'valid': False, 'error': 'Недостаточно прав'}
-        return {'valid': True, 'payload': payload}
-    except jwt.ExpiredSignatureError:
-        return {'valid': False, 'error': 'Токен истек'}
-    except jwt.InvalidTokenError:
-        return {'valid': False, 'error': 'Недействительный токен'}
+        created_at = datetime.fromisoformat(created_at)
+    except ValueError:
+        raise ValueError('Некорректный курсор')
+    
+    parsed_ranks = []
+    for rank in ranks:
+        if isinstance(rank, bool) or not isinstance(rank, (int, float, str)):
+            raise ValueError('Некорректный курсор')
+        try:
+            rank = Decimal(str(rank))
+        except ArithmeticError:
+            raise ValueError('Некорректный курсор')
+        if not rank.is_finite() or not 0 <= rank <= 1:
+            raise ValueError('Некорректный курсор')
+        parsed_ranks.append(rank)
+    
+    return parsed_ranks + [created_at, row_id]
+
+def parse_page_params(filters: Dict[str, Any], key_size: int) -> Tuple[Optional[int], Optional[List[Any]]]:
+    """Параметры постраничной выборки: limit и курсор after (без них - весь список)"""
+    if not filters.get('limit') and not filters.get('after'):
+        return None, None
+    
+    try:
+        limit = int(filters.get('limit') or LIST_PAGE_DEFAULT_LIMIT)
+    except ValueError:
+        raise ValueError('Некорректный limit')
+    limit = max(1, min(limit, LIST_PAGE_MAX_LIMIT))
+    
+    after = decode_cursor(filters['after'], key_size) if filters.get('after') else None
+    return limit, after
+
+def escape_like(term: str) -> str:
+    """Экранирование спецсимволов шаблона LIKE"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def build_search(term: str, columns: List[str], conditions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Поиск подстроки по GIN-индексам pg_trgm и выражение релевантности для сортировки"""
+    conditions = conditions or [f"{column} ILIKE %s" for column in columns]
+    pattern = f"%{escape_like(term)}%"
+    similarities = ', '.join(f"word_similarity(%s, {column})" for column in columns)
+    return {
+        'where': f"({' OR '.join(conditions)})",
+        'where_params': [pattern] * len(conditions),
+        'rank': f"ROUND(GREATEST({similarities})::numeric, 4)",
+        'rank_params': [term] * len(columns)
+    }
+
+ORDER_LIST_FIELDS = {
+    'id': 'o.id', 'clinic_id': 'o.clinic_id', 'doctor_id': 'o.doctor_id',
+    'visit_date': 'o.visit_date', 'visit_time': 'o.visit_time',
+    'patient_count': 'o.patient_count', 'service_type': 'o.service_type',
+    'urgency_level': 'o.urgency_level', 'status': 'o.status',
+    'contact_person': 'o.contact_person', 'contact_phone': 'o.contact_phone',
+    'contact_email': 'o.contact_email', 'visit_address': 'o.visit_address',
+    'visit_city': 'o.visit_city', 'visit_region': 'o.visit_region',
+    'special_requirements': 'o.special_requirements', 'estimated_cost': 'o.estimated_cost',
+    'actual_cost': 'o.actual_cost', 'payment_status': 'o.payment_status',
+    'prepayment_paid': 'o.prepayment_paid', 'clinic_comments': 'o.clinic_comments',
+    'admin_notes': 'o.admin_notes', 'clinic_rating': 'o.clinic_rating',
+    'created_at': 'o.created_at', 'updated_at': 'o.updated_at',
+    'confirmed_at': 'o.confirmed_at', 'completed_at': 'o.completed_at',
+    'clinic_name': 'c.clinic_name', 'clinic_email': 'c.email', 'clinic_phone': 'c.phone',
+    'doctor_name': 'd.full_name', 'doctor_specialty': 'd.specialty'
+}
+
+ORDER_DETAIL_FIELDS = {
+    **ORDER_LIST_FIELDS,
+    **{name: f'o.{name}' for name in (
+        'medical_equipment_needed', 'patient_conditions', 'doctor_notes', 'doctor_rating',
+        'clinic_review', 'cancelled_at', 'created_by_admin_id', 'assigned_by_admin_id'
+    )},
+    'clinic_region': 'c.region', 'clinic_city': 'c.city',
+    'experience_years': 'd.experience_years', 'doctor_photo': 'd.photo_url'
+}
+
+ORDER_JOINS = {
+    'c.': 'LEFT JOIN clinics c ON o.clinic_id = c.id',
+    'd.': 'LEFT JOIN doctors d ON o.doctor_id = d.id'
+}
+
+def parse_fields(requested: Optional[str], whitelist: Dict[str, str]) -> Optional[List[str]]:
+    """Поля из параметра fields=a,b,c (None - полный набор); ValueError для полей вне белого списка"""
+    if not requested:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in whitelist]
+    if unknown:
+        raise ValueError(f"Недопустимые поля: {', '.join(unknown)}")
+    if not names:
+        raise ValueError('Параметр fields не содержит полей')
+    return names
+
+def select_columns(names: List[str], whitelist: Dict[str, str]) -> str:
+    """SQL-список колонок для полей из белого списка"""
+    return ', '.join(f'{whitelist[name]} AS {name}' for name in names)
+
+def orders_from(expressions: List[str]) -> str:
+    """FROM orders с JOIN только тех таблиц, колонки которых запрошены"""
+    joins = [join for prefix, join in ORDER_JOINS.items() if any(expr.startswith(prefix) for expr in expressions)]
+    return ' '.join(['FROM orders o'] + joins)
+
+def drop_hidden_fields(rows: List[Dict[str, Any]], hidden: List[str]) -> None:
+    """Удаление служебных колонок (ключи курсора), которые клиент не запрашивал"""
+    if hidden:
+        for row in rows:
+            for name in hidden:
+                del row[name]
+
+ORDER_LIST_COLUMNS = select_columns(list(ORDER_LIST_FIELDS), ORDER_LIST_FIELDS)
+ORDER_LIST_JOINS = orders_from(list(ORDER_LIST_FIELDS.values()))
+
+def build_orders_search(filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Поиск по клинике, контактному лицу и городу заявки"""
+    if not filters.get('search'):
+        return None
+    return build_search(
+        filters['search'],
+        ['c.clinic_name', 'o.contact_person', 'o.visit_city'],
+        [
+            "o.clinic_id IN (SELECT id FROM clinics WHERE clinic_name ILIKE %s)",
+            "o.contact_person ILIKE %s",
+            "o.visit_city ILIKE %s"
+        ]
+    )
+
+def build_orders_filters(filters: Dict[str, Any], search: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """Условия WHERE для фильтров списка заявок"""
+    conditions = ''
+    params = []
+    
+    if filters.get('status'):
+        conditions += " AND o.status = %s"
+        params.append(filters['status'])
+    
+    if filters.get('clinic_id'):
+        conditions += " AND o.clinic_id = %s"
+        params.append(int(filters['clinic_id']))
+    
+    if filters.get('doctor_id'):
+        conditions += " AND o.doctor_id = %s"
+        params.append(int(filters['doctor_id']))
+    
+    if filters.get('urgency'):
+        conditions += " AND o.urgency_level = %s"
+        params.append(filters['urgency'])
+    
+    if search:
+        conditions += f" AND {search['where']}"
+        params.extend(search['where_params'])
+    
+    return conditions, params
 
 def get_orders_list(filters: Dict[str, Any]) -> Dict[str, Any]:
     """Получение списка заявок с фильтрами и JOIN с clinics и doctors"""
+    try:
+        limit, after = parse_page_params(filters, 3 if filters.get('search') else 2)
+        fields = parse_fields(filters.get('fields'), ORDER_LIST_FIELDS)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': str(e)})
+        }
+    
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = """
-                SELECT 
-                    o.id, o.clinic_id, o.doctor_id, o.visit_date, o.visit_time,
-                    o.patient_count, o.service_type, o.urgency_level, o.status,
-                    o.contact_person, o.contact_phone, o.contact_email,
-                    o.visit_address, o.visit_city, o.visit_region,
-                    o.special_requirements, o.estimated_cost, o.actual_cost,
-                    o.payment_status, o.prepayment_paid, o.clinic_comments,
-                    o.admin_notes, o.clinic_rating, o.created_at, o.updated_at,
-                    o.confirmed_at, o.completed_at,
-                    c.clinic_name, c.email as clinic_email, c.phone as clinic_phone,
-                    d.full_name as doctor_name, d.specialty as doctor_specialty
-                FROM orders o
-                LEFT JOIN clinics c ON o.clinic_id = c.id
-                LEFT JOIN doctors d ON o.doctor_id = d.id
-                WHERE 1=1
-            """
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            search = build_orders_search(filters)
+            rank_column = ''
             params = []
             
-            if filters.get('status'):
-                query += " AND o.status = %s"
-                params.append(filters['status'])
+            if search:
+                rank_column = f", {search['rank']} AS search_rank"
+                params.extend(search['rank_params'])
             
-            if filters.get('clinic_id'):
-                query += " AND o.clinic_id = %s"
-                params.append(int(filters['clinic_id']))
+            columns, joins, hidden = ORDER_LIST_COLUMNS, ORDER_LIST_JOINS, []
+            if fields:
+                hidden = [key for key in ('created_at', 'id') if key not in fields]
+                selected = fields + hidden
+                expressions = [ORDER_LIST_FIELDS[name] for name in selected] + (['c.clinic_name'] if search else [])
+                columns, joins = select_columns(selected, ORDER_LIST_FIELDS), orders_from(expressions)
             
-            if filters.get('doctor_id'):
-                query += " AND o.doctor_id = %s"
-                params.append(int(filters['doctor_id']))
+            conditions, filter_params = build_orders_filters(filters, search)
+            query = f"SELECT {columns}{rank_column} {joins} WHERE 1=1{conditions}"
+            params.extend(filter_params)
             
-            if filters.get('urgency'):
-                query += " AND o.urgency_level = %s"
-                params.append(filters['urgency'])
+            if after and search:
+                query += f" AND ({search['rank']}, o.created_at, o.id) < (%s::numeric, %s::timestamp, %s)"
+                params.extend(search['rank_params'] + after)
+            elif after:
+                query += " AND (o.created_at, o.id) < (%s::timestamp, %s)"
+                params.extend(after)
             
-            if filters.get('search'):
-                query += " AND (c.clinic_name ILIKE %s OR o.contact_person ILIKE %s OR o.visit_city ILIKE %s)"
-                search_term = f"%{filters['search']}%"
-                params.extend([search_term, search_term, search_term])
+            if search:
+                query += " ORDER BY search_rank DESC, o.created_at DESC, o.id DESC"
+            else:
+                query += " ORDER BY o.created_at DESC, o.id DESC"
             
-            query += " ORDER BY o.created_at DESC"
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit + 1)
             
             cur.execute(query, params)
             orders = cur.fetchall()
             
-            orders_list = []
-            for order in orders:
-                order_dict = dict(order)
-                if order_dict.get('visit_date'):
-                    order_dict['visit_date'] = order_dict['visit_date'].isoformat()
-                if order_dict.get('created_at'):
-                    order_dict['created_at'] = order_dict['created_at'].isoformat()
-                if order_dict.get('updated_at'):
-                    order_dict['updated_at'] = order_dict['updated_at'].isoformat()
-                if order_dict.get('confirmed_at'):
-                    order_dict['confirmed_at'] = order_dict['confirmed_at'].isoformat()
-                if order_dict.get('completed_at'):
-                    order_dict['completed_at'] = order_dict['completed_at'].isoformat()
-                if order_dict.get('estimated_cost'):
-                    order_dict['estimated_cost'] = float(order_dict['estimated_cost'])
-                if order_dict.get('actual_cost'):
-                    order_dict['actual_cost'] = float(order_dict['actual_cost'])
-                orders_list.append(order_dict)
+            next_cursor = None
+            if limit and len(orders) > limit:
+                orders = orders[:limit]
+                last = orders[-1]
+                cursor_key = [last['created_at'], last['id']]
+                next_cursor = encode_cursor([last['search_rank']] + cursor_key if search else cursor_key)
+            
+            drop_hidden_fields(orders, hidden)
             
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'isBase64Encoded': False,
-                'body': json.dumps({
+                'body': to_json({
                     'success': True,
-                    'orders': orders_list,
-                    'total': len(orders_list)
+                    'orders': orders,
+                    'total': len(orders),
+                    'next_cursor': next_cursor
                 })
             }
     except Exception as e:
@@ -119,25 +833,203 @@ def get_orders_list(filters: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка получения списка: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
-def get_order_details(order_id: int) -> Dict[str, Any]:
-    """Получение полной информации о заявке"""
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8'
+}
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_MAX_ROWS = int(os.environ.get('EXPORT_MAX_ROWS', '50000'))
+
+def iter_orders_export(conn, filters: Dict[str, Any], after: Optional[List[Any]], max_rows: int) -> Iterator[Dict[str, Any]]:
+    """Чтение заявок через серверный курсор пачками фиксированного размера"""
+    conditions, params = build_orders_filters(filters, build_orders_search(filters))
+    query = f"SELECT {ORDER_LIST_COLUMNS} {ORDER_LIST_JOINS} WHERE 1=1{conditions}"
+    
+    if after:
+        query += " AND (o.created_at, o.id) < (%s::timestamp, %s)"
+        params.extend(after)
+    
+    query += " ORDER BY o.created_at DESC, o.id DESC LIMIT %s"
+    params.append(max_rows)
+    
+    with conn.cursor(name='orders_export', cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+        register_json_casts(cur)
+        cur.itersize = EXPORT_BATCH_SIZE
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+
+def write_orders_export(rows: Iterator[Dict[str, Any]], export_format: str, out: TextIO) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """Построчная запись заявок в NDJSON или CSV, возвращает число строк и последнюю строку"""
+    count = 0
+    last_row = None
+    csv_writer = None
+    
+    for row in rows:
+        if export_format == 'csv':
+            if csv_writer is None:
+                csv_writer = csv.writer(out)
+                csv_writer.writerow(row.keys())
+            csv_writer.writerow([
+                json_default(value) if type(value) in JSON_FAST_ENCODERS else value
+                for value in row.values()
+            ])
+        else:
+            out.write(to_json(row))
+            out.write('\n')
+        count += 1
+        last_row = row
+    
+    return count, last_row
+
+def export_orders(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Выгрузка истории заявок в NDJSON/CSV частями по EXPORT_MAX_ROWS строк"""
+    export_format = filters.get('format')
+    
+    try:
+        after = decode_cursor(filters['after'], 2) if filters.get('after') else None
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': str(e)})
+        }
+    
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT 
-                    o.*,
-                    c.clinic_name, c.email as clinic_email, c.phone as clinic_phone,
-                    c.region as clinic_region, c.city as clinic_city,
-                    d.full_name as doctor_name, d.specialty as doctor_specialty,
-                    d.experience_years, d.photo_url as doctor_photo
-                FROM orders o
-                LEFT JOIN clinics c ON o.clinic_id = c.id
-                LEFT JOIN doctors d ON o.doctor_id = d.id
-                WHERE o.id = %s
-            """, (order_id,))
+        started = time.perf_counter()
+        out = io.StringIO()
+        rows = iter_orders_export(conn, filters, after, EXPORT_MAX_ROWS + 1)
+        count, last_row = write_orders_export(itertools.islice(rows, EXPORT_MAX_ROWS), export_format, out)
+        has_more = next(rows, None) is not None
+        rows.close()
+        elapsed = time.perf_counter() - started
+        
+        rows_per_second = round(count / elapsed) if elapsed > 0 else count
+        next_cursor = encode_cursor([last_row['created_at'], last_row['id']]) if has_more else ''
+        print(json.dumps({
+            'event': 'orders_export',
+            'format': export_format,
+            'rows': count,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': rows_per_second
+        }))
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': EXPORT_FORMATS[export_format],
+                'Content-Disposition': f'attachment; filename="orders.{export_format}"',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Expose-Headers': 'X-Export-Rows, X-Export-Rows-Per-Second, X-Next-Cursor',
+                'X-Export-Rows': str(count),
+                'X-Export-Rows-Per-Second': str(rows_per_second),
+                'X-Next-Cursor': next_cursor
+            },
+            'isBase64Encoded': False,
+            'body': out.getvalue()
+        }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка выгрузки: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
+
+def build_etag(kind: str, record_id: int, versions: List[Any]) -> str:
+    """Слабый ETag записи по id и updated_at (включая связанные записи): один тег на несжатое и gzip/br тело"""
+    raw = f"{kind}:{record_id}:" + '|'.join(str(version) for version in versions)
+    return 'W/"' + hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение ETag с заголовком If-None-Match (список или *)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    opaque = etag.removeprefix('W/')
+    return '*' in candidates or any(candidate.removeprefix('W/') == opaque for candidate in candidates)
+
+def not_modified_response(etag: str) -> Dict[str, Any]:
+    """Ответ 304 без тела для актуальной версии у клиента"""
+    return {
+        'statusCode': 304,
+        'headers': {
+            'ETag': etag,
+            'Cache-Control': 'private, no-cache',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'ETag'
+        },
+        'isBase64Encoded': False,
+        'body': ''
+    }
+
+ORDER_DETAIL_COLUMNS = """
+    o.*,
+    c.clinic_name, c.email as clinic_email, c.phone as clinic_phone,
+    c.region as clinic_region, c.city as clinic_city,
+    d.full_name as doctor_name, d.specialty as doctor_specialty,
+    d.experience_years, d.photo_url as doctor_photo
+"""
+ORDER_DETAIL_VERSIONS = 'o.updated_at AS version_order, c.updated_at AS version_clinic, d.updated_at AS version_doctor'
+
+STATEMENTS = StatementRegistry({
+    'order_versions': f"SELECT {ORDER_DETAIL_VERSIONS} {ORDER_LIST_JOINS} WHERE o.id = %s",
+    'order_by_id': f"SELECT {ORDER_DETAIL_COLUMNS}, {ORDER_DETAIL_VERSIONS} {ORDER_LIST_JOINS} WHERE o.id = %s"
+}, DB_PREPARED_STATEMENTS)
+
+def get_order_details(order_id: int, if_none_match: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Получение информации о заявке (только запрошенные поля; 304, если версия у клиента актуальна)"""
+    if fields:
+        columns = select_columns(fields, ORDER_DETAIL_FIELDS)
+        joins = orders_from([ORDER_DETAIL_FIELDS[name] for name in fields])
+    else:
+        columns, joins = ORDER_DETAIL_COLUMNS, ORDER_LIST_JOINS
+    
+    version_columns = {'version_order': 'o.updated_at'}
+    if ORDER_JOINS['c.'] in joins:
+        version_columns['version_clinic'] = 'c.updated_at'
+    if ORDER_JOINS['d.'] in joins:
+        version_columns['version_doctor'] = 'd.updated_at'
+    versions_sql = select_columns(list(version_columns), version_columns)
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            
+            if if_none_match:
+                if fields:
+                    cur.execute(f"SELECT {versions_sql} {joins} WHERE o.id = %s", (order_id,))
+                else:
+                    STATEMENTS.execute(cur, 'order_versions', (order_id,))
+                versions = cur.fetchone()
+                
+                if not versions:
+                    return {
+                        'statusCode': 404,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'isBase64Encoded': False,
+                        'body': json.dumps({'error': 'Заявка не найдена'})
+                    }
+                
+                etag = build_etag('order', order_id, list(versions.values()) + (fields or []))
+                if etag_matches(if_none_match, etag):
+                    return not_modified_response(etag)
+            
+            if fields:
+                cur.execute(f"SELECT {columns}, {versions_sql} {joins} WHERE o.id = %s", (order_id,))
+            else:
+                STATEMENTS.execute(cur, 'order_by_id', (order_id,))
             order = cur.fetchone()
             
             if not order:
@@ -148,31 +1040,77 @@ def get_order_details(order_id: int) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Заявка не найдена'})
                 }
             
-            order_dict = dict(order)
-            if order_dict.get('visit_date'):
-                order_dict['visit_date'] = order_dict['visit_date'].isoformat()
-            if order_dict.get('created_at'):
-                order_dict['created_at'] = order_dict['created_at'].isoformat()
-            if order_dict.get('updated_at'):
-                order_dict['updated_at'] = order_dict['updated_at'].isoformat()
-            if order_dict.get('confirmed_at'):
-                order_dict['confirmed_at'] = order_dict['confirmed_at'].isoformat()
-            if order_dict.get('completed_at'):
-                order_dict['completed_at'] = order_dict['completed_at'].isoformat()
-            if order_dict.get('cancelled_at'):
-                order_dict['cancelled_at'] = order_dict['cancelled_at'].isoformat()
-            if order_dict.get('estimated_cost'):
-                order_dict['estimated_cost'] = float(order_dict['estimated_cost'])
-            if order_dict.get('actual_cost'):
-                order_dict['actual_cost'] = float(order_dict['actual_cost'])
+            versions = [order.pop(name) for name in version_columns]
+            etag = build_etag('order', order_id, versions + (fields or []))
+            
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'ETag': etag,
+                    'Cache-Control': 'private, no-cache',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Expose-Headers': 'ETag'
+                },
+                'isBase64Encoded': False,
+                'body': to_json({
+                    'success': True,
+                    'order': order
+                })
+            }
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка получения данных: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
+
+MULTI_GET_MAX_IDS = int(os.environ.get('MULTI_GET_MAX_IDS', '100'))
+
+def parse_ids(value: str) -> List[int]:
+    """Список id из параметра ids=1,2,3 без повторов, в порядке запроса"""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise ValueError('Параметр ids должен содержать числа через запятую')
+    if not ids:
+        raise ValueError('Параметр ids не содержит id')
+    if len(ids) > MULTI_GET_MAX_IDS:
+        raise ValueError(f'Не более {MULTI_GET_MAX_IDS} id за один запрос')
+    return ids
+
+def get_orders_by_ids(ids: List[int], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Пакетное получение заявок одним запросом id = ANY: порядок как в запросе, отсутствующие id в missing"""
+    hidden = []
+    if fields:
+        hidden = [] if 'id' in fields else ['id']
+        selected = fields + hidden
+        columns = select_columns(selected, ORDER_DETAIL_FIELDS)
+        joins = orders_from([ORDER_DETAIL_FIELDS[name] for name in selected])
+    else:
+        columns, joins = ORDER_DETAIL_COLUMNS, ORDER_LIST_JOINS
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            cur.execute(f"SELECT {columns} {joins} WHERE o.id = ANY(%s)", (ids,))
+            found = {row['id']: row for row in cur.fetchall()}
+            
+            orders = [found[order_id] for order_id in ids if order_id in found]
+            drop_hidden_fields(orders, hidden)
             
             return {
                 'statusCode': 200,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'isBase64Encoded': False,
-                'body': json.dumps({
+                'body': to_json({
                     'success': True,
-                    'order': order_dict
+                    'orders': orders,
+                    'missing': [order_id for order_id in ids if order_id not in found]
                 })
             }
     except Exception as e:
@@ -183,13 +1121,74 @@ def get_order_details(order_id: int) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка получения данных: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+# Счетчики клиник ведет триггер trg_orders_clinic_counters (V0011); пересчет нужен только для ремонта
+CLINIC_COUNTERS_REBUILD_SQL = """
+    WITH stats AS (
+        SELECT
+            clinic_id,
+            COUNT(*) AS total_orders_count,
+            COUNT(*) FILTER (WHERE status = 'completed') AS completed_visits_count,
+            COUNT(*) FILTER (WHERE status IN ('new', 'confirmed', 'in_progress')) AS active_orders_count,
+            COALESCE(SUM(COALESCE(actual_cost, estimated_cost, 0))
+                FILTER (WHERE status NOT IN ('cancelled', 'rejected')), 0) AS total_orders_amount,
+            COALESCE(SUM(clinic_rating), 0) AS service_rating_sum,
+            COUNT(clinic_rating) AS service_rating_count
+        FROM orders
+        GROUP BY clinic_id
+    )
+    UPDATE clinics c SET
+        total_orders_count = COALESCE(s.total_orders_count, 0),
+        completed_visits_count = COALESCE(s.completed_visits_count, 0),
+        active_orders_count = COALESCE(s.active_orders_count, 0),
+        total_orders_amount = COALESCE(s.total_orders_amount, 0),
+        service_rating_sum = COALESCE(s.service_rating_sum, 0),
+        service_rating_count = COALESCE(s.service_rating_count, 0),
+        average_service_rating = CASE
+            WHEN s.service_rating_count > 0
+            THEN ROUND(s.service_rating_sum::numeric / s.service_rating_count, 2)
+        END
+    FROM clinics base
+    LEFT JOIN stats s ON s.clinic_id = base.id
+    WHERE c.id = base.id
+"""
+
+def rebuild_clinic_counters() -> Dict[str, Any]:
+    """Полный пересчет счетчиков клиник по таблице заявок (ремонт; в обычной работе счетчики ведет триггер)"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(CLINIC_COUNTERS_REBUILD_SQL)
+            updated_count = cur.rowcount
+            conn.commit()
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': json.dumps({
+                    'success': True,
+                    'message': 'Счетчики клиник пересчитаны',
+                    'clinics_updated': updated_count
+                })
+            }
+    except Exception as e:
+        conn.rollback()
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка пересчета счетчиков: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
 
 def update_order(order_id: int, data: Dict[str, Any], admin_id: int) -> Dict[str, Any]:
     """Обновление данных заявки"""
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
             update_fields = []
             params = []
             
@@ -248,6 +1247,9 @@ def update_order(order_id: int, data: Dict[str, Any], admin_id: int) -> Dict[str
                 }
             
             conn.commit()
+            DASHBOARD_CACHE.invalidate()
+            if 'doctor_id' in data or 'status' in data or 'visit_date' in data:
+                DOCTOR_FEATURES.invalidate()
             
             return {
                 'statusCode': 200,
@@ -256,7 +1258,7 @@ def update_order(order_id: int, data: Dict[str, Any], admin_id: int) -> Dict[str
                 'body': json.dumps({
                     'success': True,
                     'message': 'Заявка обновлена',
-                    'order': dict(updated_order)
+                    'order': {'id': updated_order['id'], 'status': updated_order['status']}
                 })
             }
     except Exception as e:
@@ -268,9 +1270,660 @@ def update_order(order_id: int, data: Dict[str, Any], admin_id: int) -> Dict[str
             'body': json.dumps({'error': f'Ошибка обновления: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+ORDER_BULK_FIELDS = {
+    'doctor_id': 'integer',
+    'status': 'varchar',
+    'visit_date': 'date',
+    'visit_time': 'varchar',
+    'estimated_cost': 'numeric',
+    'actual_cost': 'numeric',
+    'payment_status': 'varchar',
+    'admin_notes': 'text',
+    'urgency_level': 'varchar'
+}
+BULK_UPDATE_MAX_ORDERS = int(os.environ.get('BULK_UPDATE_MAX_ORDERS', '500'))
+
+ORDER_STATUSES = ('new', 'confirmed', 'in_progress', 'completed', 'cancelled', 'rejected')
+ORDER_VARCHAR_LIMITS = {'status': 50, 'visit_time': 50, 'payment_status': 50, 'urgency_level': 50}
+ORDER_COST_LIMIT = 10 ** 8
+
+def is_int(value: Any) -> bool:
+    """Целое число из JSON (bool не считается числом)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def validate_order_patch(patch: Any) -> Optional[str]:
+    """Проверка одного изменения из пакета, возвращает текст ошибки.
+    Проверяется все, что иначе сорвало бы общий UPDATE ошибкой БД (типы, длины строк, DECIMAL(10, 2))"""
+    if not isinstance(patch, dict) or not is_int(patch.get('id')):
+        return 'ID заявки обязателен'
+    if not any(field in patch for field in ORDER_BULK_FIELDS):
+        return 'Нет полей для обновления'
+    if patch.get('doctor_id') is not None and not is_int(patch['doctor_id']):
+        return 'doctor_id должен быть числом'
+    if 'status' in patch and patch['status'] not in ORDER_STATUSES:
+        return f"status должен быть одним из: {', '.join(ORDER_STATUSES)}"
+    for field, max_length in ORDER_VARCHAR_LIMITS.items():
+        value = patch.get(field)
+        if value is not None and (not isinstance(value, str) or len(value) > max_length):
+            return f'{field} должен быть строкой до {max_length} символов'
+    if patch.get('admin_notes') is not None and not isinstance(patch['admin_notes'], str):
+        return 'admin_notes должен быть строкой'
+    for field in ('estimated_cost', 'actual_cost'):
+        value = patch.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return f'{field} должен быть числом'
+        if value is not None and not -ORDER_COST_LIMIT < value < ORDER_COST_LIMIT:
+            return f'{field} должен быть меньше {ORDER_COST_LIMIT} по модулю'
+    if patch.get('visit_date') is not None:
+        try:
+            date.fromisoformat(patch['visit_date'])
+        except (TypeError, ValueError):
+            return 'visit_date должна быть в формате YYYY-MM-DD'
+    return None
+
+def build_bulk_update_query(valid_patches: List[Dict[str, Any]], admin_id: int) -> Tuple[str, List[Any]]:
+    """UPDATE ... FROM (VALUES ...) для проверенных изменений: поле меняется только там, где оно передано"""
+    fields = [field for field in ORDER_BULK_FIELDS if any(field in patch for patch in valid_patches)]
+    now = datetime.now()
+    
+    assignments = [
+        f"{field} = CASE WHEN v.set_{field} THEN v.{field} ELSE o.{field} END"
+        for field in fields
+    ]
+    if 'status' in fields:
+        assignments.append("confirmed_at = CASE WHEN v.set_status AND v.status = 'confirmed' THEN v.changed_at ELSE o.confirmed_at END")
+        assignments.append("completed_at = CASE WHEN v.set_status AND v.status = 'completed' THEN v.changed_at ELSE o.completed_at END")
+    if 'doctor_id' in fields:
+        assignments.append("assigned_by_admin_id = CASE WHEN v.set_doctor_id THEN v.admin_id ELSE o.assigned_by_admin_id END")
+    assignments.append("updated_at = v.changed_at")
+    
+    columns = ['id', 'changed_at', 'admin_id']
+    row_template = ['%s::integer', '%s::timestamp', '%s::integer']
+    for field in fields:
+        columns.extend([f'set_{field}', field])
+        row_template.extend(['%s::boolean', f'%s::{ORDER_BULK_FIELDS[field]}'])
+    
+    params = []
+    for patch in valid_patches:
+        params.extend([patch['id'], now, admin_id])
+        for field in fields:
+            params.extend([field in patch, patch.get(field)])
+    
+    values_sql = ', '.join([f"({', '.join(row_template)})"] * len(valid_patches))
+    query = f"""
+        UPDATE orders o SET {', '.join(assignments)}
+        FROM (VALUES {values_sql}) AS v({', '.join(columns)})
+        WHERE o.id = v.id
+        RETURNING o.id, o.status
+    """
+    return query, params
+
+def bulk_update_orders(patches: Any, admin_id: int) -> Dict[str, Any]:
+    """Пакетное обновление заявок одним UPDATE ... FROM (VALUES ...) в одной транзакции"""
+    if not isinstance(patches, list) or not patches or len(patches) > BULK_UPDATE_MAX_ORDERS:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'orders должен быть непустым списком до {BULK_UPDATE_MAX_ORDERS} заявок'})
+        }
+    
+    errors: Dict[int, str] = {}
+    valid_patches = []
+    seen_ids = set()
+    for position, patch in enumerate(patches):
+        error = validate_order_patch(patch)
+        if not error and patch['id'] in seen_ids:
+            error = 'Заявка повторяется в пакете'
+        if error:
+            errors[position] = error
+        else:
+            seen_ids.add(patch['id'])
+            valid_patches.append(patch)
+    
+    updated_orders: Dict[int, Dict[str, Any]] = {}
+    if valid_patches:
+        conn = get_db_connection()
+        try:
+            with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+                # Несуществующий врач сорвал бы весь пакет нарушением внешнего ключа: отсекаем такие строки заранее
+                doctor_ids = list({patch['doctor_id'] for patch in valid_patches if patch.get('doctor_id') is not None})
+                if doctor_ids:
+                    cur.execute("SELECT id FROM doctors WHERE id = ANY(%s)", (doctor_ids,))
+                    known_doctors = {row['id'] for row in cur.fetchall()}
+                    for position, patch in enumerate(patches):
+                        if position not in errors and patch.get('doctor_id') is not None and patch['doctor_id'] not in known_doctors:
+                            errors[position] = 'Врач не найден'
+                    valid_patches = [
+                        patch for patch in valid_patches
+                        if patch.get('doctor_id') is None or patch['doctor_id'] in known_doctors
+                    ]
+                
+                if valid_patches:
+                    query, params = build_bulk_update_query(valid_patches, admin_id)
+                    cur.execute(query, params)
+                    updated_orders = {row['id']: row for row in cur.fetchall()}
+                    conn.commit()
+                    DASHBOARD_CACHE.invalidate()
+                    DOCTOR_FEATURES.invalidate()
+        except Exception as e:
+            conn.rollback()
+            return {
+                'statusCode': 500,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': json.dumps({'error': f'Ошибка пакетного обновления: {str(e)}'})
+            }
+        finally:
+            release_db_connection(conn)
+    
+    results = []
+    for position, patch in enumerate(patches):
+        order_id = patch.get('id') if isinstance(patch, dict) else None
+        if position in errors:
+            results.append({'id': order_id, 'success': False, 'error': errors[position]})
+        elif order_id in updated_orders:
+            results.append({'id': order_id, 'success': True, 'status': updated_orders[order_id]['status']})
+        else:
+            results.append({'id': order_id, 'success': False, 'error': 'Заявка не найдена'})
+    
+    updated_count = sum(1 for result in results if result['success'])
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'isBase64Encoded': False,
+        'body': json.dumps({
+            'success': updated_count > 0,
+            'message': f'Обновлено заявок: {updated_count} из {len(patches)}',
+            'results': results
+        })
+    }
+
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', '300'))
+DASHBOARD_DEFAULT_DAYS = 30
+DASHBOARD_MAX_DAYS = 366
+
+class AggregateCache:
+    """Кеш готовых агрегатов с TTL; сбрасывается целиком при изменении заявок"""
+    
+    def __init__(self, ttl: float, max_size: int = 64):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Any, Tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+    
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            return entry[0]
+    
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'size': len(self._entries), 'ttl': self.ttl}
+
+DASHBOARD_CACHE = AggregateCache(DASHBOARD_CACHE_TTL)
+
+# Заявки без срочности считаются обычными и попадают в одну группу с urgency_level = normal
+DASHBOARD_SQL = """
+    SELECT
+        GROUPING(status) AS g_status,
+        GROUPING(COALESCE(urgency_level, 'normal')) AS g_urgency,
+        GROUPING(created_at::date) AS g_day,
+        status, COALESCE(urgency_level, 'normal') AS urgency_level, created_at::date AS day,
+        COUNT(*) AS orders_count,
+        COALESCE(SUM(COALESCE(actual_cost, estimated_cost, 0))
+            FILTER (WHERE status NOT IN ('cancelled', 'rejected')), 0) AS total_amount,
+        COALESCE(SUM(actual_cost) FILTER (WHERE status = 'completed'), 0) AS completed_amount,
+        COALESCE(SUM(estimated_cost) FILTER (WHERE status IN ('new', 'confirmed', 'in_progress')), 0) AS pipeline_amount
+    FROM orders
+    WHERE created_at >= %s AND created_at < %s + INTERVAL '1 day'
+    GROUP BY GROUPING SETS ((status), (COALESCE(urgency_level, 'normal')), (created_at::date), ())
+"""
+
+def get_orders_dashboard(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Сводка по заявкам за период: разбивка по статусам, срочности и дням, суммы"""
+    try:
+        date_to = date.fromisoformat(filters['date_to']) if filters.get('date_to') else date.today()
+        date_from = (date.fromisoformat(filters['date_from']) if filters.get('date_from')
+                     else date_to - timedelta(days=DASHBOARD_DEFAULT_DAYS - 1))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'Даты должны быть в формате YYYY-MM-DD'})
+        }
+    
+    if date_to < date_from or (date_to - date_from).days >= DASHBOARD_MAX_DAYS:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Период должен быть от 1 до {DASHBOARD_MAX_DAYS} дней'})
+        }
+    
+    cache_key = (date_from, date_to)
+    body = DASHBOARD_CACHE.get(cache_key)
+    if body is not None:
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'X-Cache': 'HIT'},
+            'isBase64Encoded': False,
+            'body': body
+        }
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            register_json_casts(cur)
+            cur.execute(DASHBOARD_SQL, (date_from, date_to))
+            rows = cur.fetchall()
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка построения сводки: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
+    
+    totals = {'orders_count': 0, 'total_amount': 0.0, 'completed_amount': 0.0, 'pipeline_amount': 0.0}
+    by_status, by_urgency, by_day = {}, {}, []
+    for row in rows:
+        bucket = {key: row[key] for key in totals}
+        if not row['g_status']:
+            by_status[row['status']] = bucket
+        elif not row['g_urgency']:
+            by_urgency[row['urgency_level']] = bucket
+        elif not row['g_day']:
+            by_day.append({'date': row['day'], **bucket})
+        else:
+            totals = bucket
+    by_day.sort(key=lambda bucket: bucket['date'])
+    
+    body = to_json({
+        'success': True,
+        'date_from': date_from,
+        'date_to': date_to,
+        'totals': totals,
+        'by_status': by_status,
+        'by_urgency': by_urgency,
+        'by_day': by_day
+    })
+    DASHBOARD_CACHE.put(cache_key, body)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'X-Cache': 'MISS'},
+        'isBase64Encoded': False,
+        'body': body
+    }
+
+DOCTOR_FEATURES_TTL = float(os.environ.get('DOCTOR_FEATURES_TTL', '60'))
+SUGGEST_HORIZON_DAYS = 120
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+SUGGEST_WEIGHTS = {
+    'specialty': 0.4,
+    'availability': 0.25,
+    'rating': 0.15,
+    'experience': 0.1,
+    'load': 0.1
+}
+
+class DoctorFeatureCache:
+    """Снимок признаков активных врачей для подбора: специальность, рейтинг, свободные даты, загрузка"""
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._generation = 0
+        self._stats = {'hits': 0, 'refreshes': 0, 'invalidations': 0, 'last_refresh_ms': 0.0}
+    
+    def _load(self) -> Dict[str, Any]:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id, full_name, specialty, workplace_type,
+                        COALESCE(rating, 0)::float, COALESCE(successful_visits_count, 0)
+                    FROM doctors
+                    WHERE status = 'active'
+                """)
+                doctors = {}
+                by_specialty: Dict[str, List[int]] = {}
+                for doctor_id, full_name, specialty, workplace_type, rating, visits in cur:
+                    doctors[doctor_id] = {
+                        'id': doctor_id,
+                        'full_name': full_name,
+                        'specialty': specialty,
+                        'workplace_type': workplace_type,
+                        'rating': rating,
+                        'successful_visits_count': visits
+                    }
+                    by_specialty.setdefault(specialty.strip().lower(), []).append(doctor_id)
+                
+                cur.execute("""
+                    SELECT a.doctor_id, a.available_date, a.capacity
+                    FROM doctor_availability a
+                    WHERE a.available_date BETWEEN CURRENT_DATE AND CURRENT_DATE + %s
+                """, (SUGGEST_HORIZON_DAYS,))
+                capacity = {(doctor_id, day): slots for doctor_id, day, slots in cur}
+                
+                cur.execute("""
+                    SELECT doctor_id, visit_date, COUNT(*)
+                    FROM orders
+                    WHERE status = 'confirmed' AND doctor_id IS NOT NULL
+                        AND visit_date >= CURRENT_DATE
+                    GROUP BY doctor_id, visit_date
+                """)
+                booked: Dict[Tuple[int, date], int] = {}
+                upcoming: Dict[int, int] = {}
+                for doctor_id, day, count in cur:
+                    booked[(doctor_id, day)] = count
+                    upcoming[doctor_id] = upcoming.get(doctor_id, 0) + count
+            conn.commit()
+        finally:
+            release_db_connection(conn)
+        
+        return {
+            'doctors': doctors,
+            'by_specialty': by_specialty,
+            'capacity': capacity,
+            'booked': booked,
+            'upcoming': upcoming,
+            'max_visits': max((d['successful_visits_count'] for d in doctors.values()), default=0),
+            'max_upcoming': max(upcoming.values(), default=0)
+        }
+    
+    def get(self) -> Tuple[Dict[str, Any], float]:
+        """Актуальный снимок и его возраст в секундах (перечитывается по истечении TTL).
+        Запросы к БД идут вне блокировки: пока один поток обновляет снимок, остальные получают прежний"""
+        with self._lock:
+            age = time.monotonic() - self._loaded_at
+            if self._snapshot is not None and (age < self.ttl or self._refreshing):
+                self._stats['hits'] += 1
+                return self._snapshot, age
+            self._refreshing = True
+            generation = self._generation
+        
+        started = time.perf_counter()
+        try:
+            snapshot = self._load()
+        finally:
+            with self._lock:
+                self._refreshing = False
+        
+        with self._lock:
+            # Снимок, прочитанный до invalidate(), отдается вызвавшему, но не сохраняется
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+            self._stats['refreshes'] += 1
+            self._stats['last_refresh_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return snapshot, 0.0
+    
+    def invalidate(self) -> None:
+        """Сброс снимка после изменения назначений или статусов заявок"""
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+            self._stats['invalidations'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'doctors': len(self._snapshot['doctors']) if self._snapshot else 0,
+                'ttl': self.ttl
+            }
+
+DOCTOR_FEATURES = DoctorFeatureCache(DOCTOR_FEATURES_TTL)
+
+def specialty_match(service_type: str, specialty: str) -> float:
+    """Совпадение вида услуги со специальностью: 1 - точное, 0.6 - вхождение, 0 - нет"""
+    if not service_type or not specialty:
+        return 0.0
+    if service_type == specialty:
+        return 1.0
+    if service_type in specialty or specialty in service_type:
+        return 0.6
+    return 0.0
+
+def score_doctor(features: Dict[str, Any], doctor: Dict[str, Any], match: float,
+                 visit_date: Optional[date], current_doctor_id: Optional[int]) -> Dict[str, float]:
+    """Составляющие оценки врача для заявки и итоговый балл"""
+    doctor_id = doctor['id']
+    upcoming = features['upcoming'].get(doctor_id, 0)
+    available = 0.0
+    if visit_date:
+        booked = features['booked'].get((doctor_id, visit_date), 0)
+        if doctor_id == current_doctor_id:
+            booked = max(booked - 1, 0)
+        available = 1.0 if features['capacity'].get((doctor_id, visit_date), 0) > booked else 0.0
+    
+    parts = {
+        'specialty': match,
+        'availability': available,
+        'rating': doctor['rating'] / 5,
+        'experience': doctor['successful_visits_count'] / features['max_visits'] if features['max_visits'] else 0.0,
+        'load': 1 - upcoming / features['max_upcoming'] if features['max_upcoming'] else 1.0
+    }
+    parts['score'] = round(sum(SUGGEST_WEIGHTS[name] * value for name, value in parts.items()), 4)
+    return parts
+
+def suggest_doctors(order_id: int, limit_param: Optional[str]) -> Dict[str, Any]:
+    """Подбор врачей для заявки: top-N по специальности, свободной дате, рейтингу, опыту и загрузке"""
+    try:
+        limit = min(max(int(limit_param or SUGGEST_DEFAULT_LIMIT), 1), SUGGEST_MAX_LIMIT)
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'Некорректный параметр limit'})
+        }
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            cur.execute("SELECT id, service_type, visit_date, doctor_id FROM orders WHERE id = %s", (order_id,))
+            order = cur.fetchone()
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка подбора врачей: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
+    
+    if not order:
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'Заявка не найдена'})
+        }
+    
+    started = time.perf_counter()
+    try:
+        features, features_age = DOCTOR_FEATURES.get()
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': f'Ошибка подбора врачей: {str(e)}'})
+        }
+    service_type = (order['service_type'] or '').strip().lower()
+    
+    matches = {}
+    for specialty, doctor_ids in features['by_specialty'].items():
+        match = specialty_match(service_type, specialty)
+        if match:
+            for doctor_id in doctor_ids:
+                matches[doctor_id] = match
+    if not matches:
+        matches = dict.fromkeys(features['doctors'], 0.0)
+    
+    scored = []
+    for doctor_id, match in matches.items():
+        doctor = features['doctors'][doctor_id]
+        parts = score_doctor(features, doctor, match, order['visit_date'], order['doctor_id'])
+        scored.append((parts['score'], doctor, parts))
+    
+    top = heapq.nlargest(limit, scored, key=lambda item: (item[0], item[1]['rating'], -item[1]['id']))
+    candidates = [{**doctor, 'score': score, 'score_parts': parts} for score, doctor, parts in top]
+    for candidate in candidates:
+        del candidate['score_parts']['score']
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'isBase64Encoded': False,
+        'body': to_json({
+            'success': True,
+            'order_id': order['id'],
+            'candidates': candidates,
+            'scored_doctors': len(scored),
+            'features_age_seconds': round(features_age, 1),
+            'scoring_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+    }
+
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1400'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+COMPRESSION_STATS = {'compressed': 0, 'skipped_small': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_ms': 0.0}
+COMPRESSION_LOCK = threading.Lock()
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Кодировки из Accept-Encoding с их q-весами"""
+    accepted = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        accepted[name.strip().lower()] = weight
+    return accepted
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """Лучшая поддерживаемая кодировка: br (если установлен brotli), затем gzip"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = (['br'] if brotli else []) + ['gzip']
+    best = max(candidates, key=lambda name: accepted.get(name, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """Сжатие тела ответа по Accept-Encoding, если оно больше COMPRESSION_MIN_BYTES"""
+    body = response.get('body')
+    if response.get('statusCode') != 200 or response.get('isBase64Encoded') or not isinstance(body, str):
+        return response
+    
+    headers = event.get('headers') or {}
+    encoding = choose_encoding(headers.get('Accept-Encoding') or headers.get('accept-encoding'))
+    if not encoding:
+        return response
+    
+    raw = body.encode('utf-8')
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        with COMPRESSION_LOCK:
+            COMPRESSION_STATS['skipped_small'] += 1
+        return response
+    
+    started = time.process_time()
+    with Span('compress'):
+        if encoding == 'br':
+            compressed = brotli.compress(raw, quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(raw, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+    cpu_ms = (time.process_time() - started) * 1000
+    ratio = len(compressed) / len(raw)
+    
+    with COMPRESSION_LOCK:
+        COMPRESSION_STATS['compressed'] += 1
+        COMPRESSION_STATS['bytes_in'] += len(raw)
+        COMPRESSION_STATS['bytes_out'] += len(compressed)
+        COMPRESSION_STATS['cpu_ms'] += cpu_ms
+    
+    response_headers = dict(response.get('headers') or {})
+    exposed = response_headers.get('Access-Control-Expose-Headers')
+    response_headers.update({
+        'Content-Encoding': encoding,
+        'Vary': 'Accept-Encoding',
+        'X-Compression': f'{encoding}; ratio={ratio:.3f}; cpu_ms={cpu_ms:.2f}; original={len(raw)}',
+        'Access-Control-Expose-Headers': f'{exposed}, X-Compression' if exposed else 'X-Compression'
+    })
+    return {
+        **response,
+        'headers': response_headers,
+        'isBase64Encoded': True,
+        'body': base64.b64encode(compressed).decode('ascii')
+    }
+
+def compression_stats() -> Dict[str, Any]:
+    """Суммарная степень сжатия и затраты CPU текущего контейнера"""
+    with COMPRESSION_LOCK:
+        stats = dict(COMPRESSION_STATS)
+    stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 4) if stats['bytes_in'] else None
+    stats['cpu_ms'] = round(stats['cpu_ms'], 2)
+    stats['min_bytes'] = COMPRESSION_MIN_BYTES
+    stats['brotli'] = brotli is not None
+    return stats
+
+def get_metrics() -> Dict[str, Any]:
+    """Счетчики производительности текущего контейнера"""
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'isBase64Encoded': False,
+        'body': json.dumps({
+            'success': True,
+            'db_pool': DB_POOL.stats(),
+            'token_cache': TOKEN_CACHE.stats(),
+            'revocations': REVOKED_TOKENS.stats(),
+            'prepared_statements': STATEMENTS.stats(),
+            'doctor_features': DOCTOR_FEATURES.stats(),
+            'dashboard_cache': DASHBOARD_CACHE.stats(),
+            'compression': compression_stats()
+        })
+    }
+
+def route_request(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
@@ -279,7 +1932,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, If-None-Match',
                 'Access-Control-Max-Age': '86400'
             },
             'isBase64Encoded': False,
@@ -311,15 +1964,68 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     if method == 'GET':
         query_params = event.get('queryStringParameters') or {}
+        
+        if query_params.get('action') == 'metrics':
+            return get_metrics()
+        
+        if query_params.get('action') == 'dashboard':
+            return get_orders_dashboard(query_params)
+        
         order_id = query_params.get('id')
         
+        if query_params.get('action') == 'suggest_doctors':
+            if not order_id or not order_id.isdigit():
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'error': 'ID заявки обязателен и должен быть числом'})
+                }
+            return suggest_doctors(int(order_id), query_params.get('limit'))
+        
+        if query_params.get('format') and query_params.get('format') != 'json':
+            if query_params['format'] not in EXPORT_FORMATS:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'error': 'Поддерживаемые форматы выгрузки: ndjson, csv'})
+                }
+            return export_orders(query_params)
+        
+        if query_params.get('ids'):
+            try:
+                ids = parse_ids(query_params['ids'])
+                fields = parse_fields(query_params.get('fields'), ORDER_DETAIL_FIELDS)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'error': str(e)})
+                }
+            return get_orders_by_ids(ids, fields)
+        
         if order_id:
-            return get_order_details(int(order_id))
+            try:
+                fields = parse_fields(query_params.get('fields'), ORDER_DETAIL_FIELDS)
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'error': str(e)})
+                }
+            return get_order_details(int(order_id), headers.get('If-None-Match') or headers.get('if-none-match'), fields)
         else:
             return get_orders_list(query_params)
     
     elif method == 'PUT':
         body_data = json.loads(event.get('body', '{}'))
+        
+        if body_data.get('action') == 'bulk_update':
+            return bulk_update_orders(body_data.get('orders'), admin_id)
+        
         order_id = body_data.get('id')
         
         if not order_id:
@@ -332,9 +2038,33 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         return update_order(order_id, body_data, admin_id)
     
+    elif method == 'POST':
+        body_data = json.loads(event.get('body', '{}'))
+        action = body_data.get('action')
+        
+        if action == 'rebuild_clinic_counters':
+            if admin_payload.get('role') != 'super_admin':
+                return {
+                    'statusCode': 403,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'error': 'Недостаточно прав'})
+                }
+            return rebuild_clinic_counters()
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'Неизвестное действие'})
+        }
+    
     return {
         'statusCode': 405,
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
         'isBase64Encoded': False,
         'body': json.dumps({'error': 'Метод не поддерживается'})
     }
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return with_server_timing(event, context, lambda event, context: compress_response(event, route_request(event, context)))
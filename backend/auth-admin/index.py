@@ -5,51 +5,705 @@ Args: event - dict with httpMethod, body, queryStringParameters
 Returns: HTTP response dict with JWT token or error
 '''
 
+import atexit
+import importlib
 import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import bcrypt
+import hashlib
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextvars import ContextVar
 from datetime import datetime, timedelta
-from typing import Dict, Any
-import jwt
+from typing import Dict, Any, List, Tuple, Optional
+
+class LazyModule:
+    """Прокси модуля: импорт выполняется при первом обращении к атрибуту (быстрый холодный старт)"""
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+psycopg2 = LazyModule('psycopg2')
+psycopg2_extras = LazyModule('psycopg2.extras')
+bcrypt = LazyModule('bcrypt')
+jwt = LazyModule('jwt')
+
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING', '1') == '1'
+REQUEST_SPANS: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_spans', default=None)
+TIMED_CURSOR_CLASSES: Dict[Any, Any] = {}
+TIMED_CONNECTION_CLASS: List[Any] = []
+
+class Span:
+    """Замер шага обработки текущего запроса; вне запроса или при SERVER_TIMING=0 ничего не делает"""
+    __slots__ = ('name', 'spans', 'started')
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def __enter__(self) -> 'Span':
+        self.spans = REQUEST_SPANS.get()
+        if self.spans is not None:
+            self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> bool:
+        if self.spans is not None:
+            self.spans[self.name] = self.spans.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+def timed_cursor_class(base):
+    """Подкласс курсора, который замеряет execute и fetch* в спанах db_execute и db_fetch"""
+    timed = TIMED_CURSOR_CLASSES.get(base)
+    if timed is None:
+        class TimedCursor(base):
+            def execute(self, query, vars=None):
+                with Span('db_execute'):
+                    return super().execute(query, vars)
+            
+            def copy_expert(self, sql, file, size=8192):
+                with Span('db_execute'):
+                    return super().copy_expert(sql, file, size)
+            
+            def fetchone(self):
+                with Span('db_fetch'):
+                    return super().fetchone()
+            
+            def fetchmany(self, size=None):
+                with Span('db_fetch'):
+                    return super().fetchmany(size) if size is not None else super().fetchmany()
+            
+            def fetchall(self):
+                with Span('db_fetch'):
+                    return super().fetchall()
+        
+        timed = TIMED_CURSOR_CLASSES[base] = TimedCursor
+    return timed
+
+def timed_connection_class():
+    """Класс подключения, все курсоры которого замеряются"""
+    if not TIMED_CONNECTION_CLASS:
+        class TimedConnection(psycopg2.extensions.connection):
+            def cursor(self, *args, **kwargs):
+                base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+                kwargs['cursor_factory'] = timed_cursor_class(base)
+                return super().cursor(*args, **kwargs)
+        
+        TIMED_CONNECTION_CLASS.append(TimedConnection)
+    return TIMED_CONNECTION_CLASS[0]
+
+def with_server_timing(event: Dict[str, Any], context: Any, route) -> Dict[str, Any]:
+    """Обработка запроса со сбором спанов: заголовок Server-Timing и одна строка лога по request_id"""
+    if not SERVER_TIMING_ENABLED or event.get('httpMethod') == 'OPTIONS':
+        return route(event, context)
+    
+    spans: Dict[str, float] = {}
+    token = REQUEST_SPANS.set(spans)
+    started = time.perf_counter()
+    try:
+        response = route(event, context)
+    finally:
+        REQUEST_SPANS.reset(token)
+    total = time.perf_counter() - started
+    
+    timings = {name: round(seconds * 1000, 2) for name, seconds in spans.items()}
+    timing_header = ', '.join(f'{name};dur={ms}' for name, ms in timings.items())
+    headers = dict(response.get('headers') or {})
+    exposed = headers.get('Access-Control-Expose-Headers')
+    headers.update({
+        'Server-Timing': f"{timing_header + ', ' if timing_header else ''}total;dur={round(total * 1000, 2)}",
+        'Timing-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': f'{exposed}, Server-Timing' if exposed else 'Server-Timing'
+    })
+    print(json.dumps({
+        'event': 'request_timing',
+        'request_id': getattr(context, 'request_id', None),
+        'function': getattr(context, 'function_name', None),
+        'method': event.get('httpMethod'),
+        'action': (event.get('queryStringParameters') or {}).get('action'),
+        'status': response.get('statusCode'),
+        'total_ms': round(total * 1000, 2),
+        'spans': timings
+    }))
+    return {**response, 'headers': headers}
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_WAIT_TIMEOUT', '5'))
+DB_POOL_HEALTHCHECK_AFTER = float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER', '30'))
+
+class ConnectionPool:
+    """Пул подключений к БД, переживающий вызовы в тёплом контейнере"""
+    
+    def __init__(self, max_size: int, wait_timeout: float, healthcheck_after: float):
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.healthcheck_after = healthcheck_after
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'reconnects': 0}
+    
+    def _connect(self):
+        if SERVER_TIMING_ENABLED:
+            return psycopg2.connect(os.environ.get('DATABASE_URL'), connection_factory=timed_connection_class())
+        return psycopg2.connect(os.environ.get('DATABASE_URL'))
+    
+    def _close_quietly(self, conn) -> None:
+        STATEMENTS.forget(conn)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+    
+    def _discard(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+    
+    def _is_alive(self, conn, idle_since: float) -> bool:
+        """Проверка подключения перед выдачей: пинг только после долгого простоя"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def acquire(self):
+        """Выдача подключения: свободное из пула, новое в пределах лимита или ожидание"""
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._stats['hits'] += 1
+                    break
+                if self._size < self.max_size:
+                    conn, idle_since = None, 0.0
+                    self._size += 1
+                    self._stats['misses'] += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise psycopg2.OperationalError('Пул подключений к БД исчерпан')
+                if not waited:
+                    waited = True
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+        
+        try:
+            if conn is None:
+                return self._connect()
+            if not self._is_alive(conn, idle_since):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._stats['reconnects'] += 1
+                return self._connect()
+            return conn
+        except Exception:
+            self._discard()
+            raise
+    
+    def release(self, conn) -> None:
+        """Возврат подключения в пул с откатом незавершенной транзакции"""
+        if not conn.closed and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close_quietly(conn)
+        
+        if conn.closed:
+            STATEMENTS.forget(conn)
+            self._discard()
+            return
+        
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий/промахов/ожиданий пула"""
+        with self._cond:
+            return {**self._stats, 'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+DB_POOL = ConnectionPool(DB_POOL_MAX_SIZE, DB_POOL_WAIT_TIMEOUT, DB_POOL_HEALTHCHECK_AFTER)
 
 def get_db_connection():
-    """Создание подключения к БД"""
-    database_url = os.environ.get('DATABASE_URL')
-    return psycopg2.connect(database_url)
+    """Получение подключения к БД из пула"""
+    with Span('db_connect'):
+        return DB_POOL.acquire()
+
+def release_db_connection(conn) -> None:
+    """Возврат подключения в пул вместо закрытия"""
+    DB_POOL.release(conn)
+
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', str(os.cpu_count() or 1)))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', '16'))
+BCRYPT_QUEUE_TIMEOUT = float(os.environ.get('BCRYPT_QUEUE_TIMEOUT', '5'))
+BCRYPT_LATENCY_BUDGET_MS = float(os.environ.get('BCRYPT_LATENCY_BUDGET_MS', '250'))
+BCRYPT_MIN_COST = int(os.environ.get('BCRYPT_MIN_COST', '10'))
+BCRYPT_MAX_COST = int(os.environ.get('BCRYPT_MAX_COST', '14'))
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хеширование паролей переполнена"""
+
+class PasswordHasher:
+    """Хеширование паролей bcrypt в ограниченном пуле потоков с калибровкой стоимости"""
+    
+    def __init__(self, workers: int, max_pending: int, queue_timeout: float):
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._cost_lock = threading.Lock()
+        self._target_cost: Optional[int] = None
+    
+    def _run(self, func, *args):
+        with Span('bcrypt_queue'):
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        if not acquired:
+            raise PasswordHasherBusy('Очередь хеширования паролей переполнена')
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with Span('bcrypt'):
+            return future.result()
+    
+    def calibrate(self) -> int:
+        """Подбор максимальной стоимости, укладывающейся в бюджет задержки"""
+        started = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(BCRYPT_MIN_COST))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        cost = BCRYPT_MIN_COST
+        while cost < BCRYPT_MAX_COST and elapsed_ms * 2 <= BCRYPT_LATENCY_BUDGET_MS:
+            cost += 1
+            elapsed_ms *= 2
+        return cost
+    
+    def target_cost(self) -> int:
+        """Целевая стоимость: BCRYPT_COST из окружения или калибровка при первом обращении"""
+        if self._target_cost is None:
+            with self._cost_lock:
+                if self._target_cost is None:
+                    configured = os.environ.get('BCRYPT_COST')
+                    self._target_cost = int(configured) if configured else self.calibrate()
+        return self._target_cost
+    
+    def hash(self, password: str) -> str:
+        """Хеширование пароля с целевой стоимостью"""
+        salt = bcrypt.gensalt(self.target_cost())
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+    
+    def verify(self, password: str, hashed: str) -> bool:
+        """Проверка пароля против хеша с любой стоимостью"""
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+    
+    def needs_rehash(self, hashed: str) -> bool:
+        """Хеш слабее заданной BCRYPT_COST. Калиброванная стоимость зависит от контейнера и шума замера,
+        поэтому существующие хеши переводятся только при явной BCRYPT_COST и только на большую стоимость"""
+        if not os.environ.get('BCRYPT_COST'):
+            return False
+        try:
+            return int(hashed.split('$')[2]) < self.target_cost()
+        except (IndexError, ValueError):
+            return False
+
+PASSWORD_HASHER = PasswordHasher(BCRYPT_WORKERS, BCRYPT_MAX_PENDING, BCRYPT_QUEUE_TIMEOUT)
+
+DB_PREPARED_STATEMENTS = os.environ.get('DB_PREPARED_STATEMENTS', '1') == '1'
+PREPARED_STATEMENT_ERRORS = ('26000', '42P05')
+PREPARED_PLAN_CHANGED = '0A000'
+
+class StatementRegistry:
+    """Горячие запросы с неизменным текстом: PREPARE один раз на подключение пула, дальше EXECUTE.
+    При DB_PREPARED_STATEMENTS=0 или за пулером в режиме транзакций выполняются обычным execute"""
+    
+    def __init__(self, queries: Dict[str, str], enabled: bool):
+        self.queries = queries
+        self.enabled = enabled
+        self._prepared: Dict[Any, set] = {}
+        self._lock = threading.Lock()
+        self._stats = {'prepares': 0, 'reprepares': 0, 'executes': 0, 'plain': 0, 'fallbacks': 0}
+    
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+    
+    def _prepare(self, cur, name: str, sql: str, param_count: int) -> None:
+        positional = sql
+        for position in range(1, param_count + 1):
+            positional = positional.replace('%s', f'${position}', 1)
+        cur.execute(f'PREPARE {name} AS {positional}')
+        self._count('prepares')
+    
+    def execute(self, cur, name: str, params: Tuple[Any, ...]) -> None:
+        """Выполнение запроса по имени; вызывать только для чтения в начале транзакции"""
+        sql = self.queries[name]
+        if not self.enabled:
+            self._count('plain')
+            cur.execute(sql, params)
+            return
+        
+        conn = cur.connection
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+        try:
+            if name not in prepared:
+                self._prepare(cur, name, sql, len(params))
+                prepared.add(name)
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+            self._count('executes')
+        except psycopg2.Error as e:
+            if e.pgcode == PREPARED_PLAN_CHANGED and name in prepared:
+                # ALTER TABLE изменил тип результата: план на подключении устарел, готовим запрос заново
+                conn.rollback()
+                cur.execute(f'DEALLOCATE {name}')
+                self._prepare(cur, name, sql, len(params))
+                self._count('reprepares')
+                cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+                self._count('executes')
+                return
+            if e.pgcode not in PREPARED_STATEMENT_ERRORS:
+                raise
+            # Пулер в режиме транзакций отдает другой backend: подготовленные запросы недоступны
+            conn.rollback()
+            self.enabled = False
+            self._count('fallbacks')
+            print(json.dumps({'event': 'prepared_statements_disabled', 'statement': name, 'pgcode': e.pgcode}))
+            cur.execute(sql, params)
+    
+    def forget(self, conn) -> None:
+        """Подключение закрыто: его подготовленные запросы больше не существуют"""
+        with self._lock:
+            self._prepared.pop(conn, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'enabled': self.enabled, 'connections': len(self._prepared)}
+
+STATEMENTS = StatementRegistry({
+    'admin_by_email': "SELECT id, email, password_hash, full_name, role, is_active FROM admins WHERE email = %s"
+}, DB_PREPARED_STATEMENTS)
+
+LAST_LOGIN_FLUSH_INTERVAL = float(os.environ.get('LAST_LOGIN_FLUSH_INTERVAL', '5'))
+LAST_LOGIN_MAX_PENDING = int(os.environ.get('LAST_LOGIN_MAX_PENDING', '200'))
+
+class LastLoginBuffer:
+    """Отложенная запись last_login: вход не ждет commit, накопленные отметки пишутся одним UPDATE ... FROM (VALUES)
+    по таймеру, при достижении порога и при завершении процесса"""
+    
+    def __init__(self, table: str, flush_interval: float, max_pending: int):
+        self.table = table
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'recorded': 0, 'flushes': 0, 'rows': 0, 'errors': 0}
+    
+    def record(self, entity_id: int, at: datetime) -> None:
+        """Отметка входа; поток записи стартует при первом входе, а не при импорте"""
+        with self._lock:
+            previous = self._pending.get(entity_id)
+            self._pending[entity_id] = at if previous is None or at > previous else previous
+            self._stats['recorded'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'{self.table}-last-login', daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.max_pending:
+                self._wakeup.set()
+    
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self) -> int:
+        """Запись накопленных отметок одной транзакцией; при ошибке отметки возвращаются в буфер"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            
+            conn = None
+            try:
+                conn = get_db_connection()
+                with conn.cursor() as cur:
+                    psycopg2_extras.execute_values(cur, f"""
+                        UPDATE {self.table} t SET last_login = GREATEST(t.last_login, v.last_login)
+                        FROM (VALUES %s) AS v(id, last_login)
+                        WHERE t.id = v.id
+                    """, list(batch.items()), template='(%s::integer, %s::timestamp)', page_size=len(batch))
+                conn.commit()
+            except Exception as e:
+                with self._lock:
+                    for entity_id, at in batch.items():
+                        current = self._pending.get(entity_id)
+                        if current is None or at > current:
+                            self._pending[entity_id] = at
+                    self._stats['errors'] += 1
+                print(json.dumps({'event': 'last_login_flush_failed', 'table': self.table, 'rows': len(batch), 'error': str(e)}))
+                return 0
+            finally:
+                if conn is not None:
+                    release_db_connection(conn)
+            
+            with self._lock:
+                self._stats['flushes'] += 1
+                self._stats['rows'] += len(batch)
+            return len(batch)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending)}
+
+LAST_LOGINS = LastLoginBuffer('admins', LAST_LOGIN_FLUSH_INTERVAL, LAST_LOGIN_MAX_PENDING)
+atexit.register(LAST_LOGINS.flush)
 
 def verify_password(password: str, hashed: str) -> bool:
     """Проверка пароля"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    return PASSWORD_HASHER.verify(password, hashed)
+
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+
+class VerifiedTokenCache:
+    """LRU-кеш проверенных токенов: ключ - SHA-256 токена, значение - payload до момента exp"""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+    
+    def _key(self, token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Payload ранее проверенного токена или None"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return payload
+    
+    def put(self, token: str, payload: Dict[str, Any]) -> None:
+        """Сохранение payload успешно проверенного токена (только токены с exp)"""
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)):
+            return
+        
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики и доля попаданий кеша"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+TOKEN_CACHE = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
+REVOCATION_REFRESH_INTERVAL = float(os.environ.get('REVOCATION_REFRESH_INTERVAL', '30'))
+REVOCATION_FULL_RELOAD_INTERVAL = float(os.environ.get('REVOCATION_FULL_RELOAD_INTERVAL', '600'))
+REVOCATION_BLOOM_BITS = int(os.environ.get('REVOCATION_BLOOM_BITS', str(1 << 16)))
+REVOCATION_BLOOM_HASHES = 4
+
+REVOKED_TOKENS_SQL = """
+    SELECT id, jti, admin_id, EXTRACT(EPOCH FROM revoked_at)::float8 AS revoked_at
+    FROM revoked_tokens
+    WHERE id > %s AND expires_at > now()
+    ORDER BY id
+"""
+
+class RevocationFilter:
+    """Отозванные токены администраторов в памяти: фильтр Блума отсекает почти все проверки, точное множество
+    подтверждает попадание. revoked_tokens дочитывается раз в refresh_interval, а не на каждый запрос"""
+    
+    def __init__(self, refresh_interval: float, full_reload_interval: float, bloom_bits: int):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.bloom_bits = bloom_bits
+        self._bloom = bytearray((bloom_bits + 7) // 8)
+        self._jtis: set = set()
+        self._admins: Dict[int, float] = {}
+        self._last_id = 0
+        self._refreshed_at = 0.0
+        self._reloaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stats = {'checks': 0, 'bloom_hits': 0, 'false_positives': 0, 'revoked': 0, 'refreshes': 0, 'errors': 0}
+    
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        return [int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % self.bloom_bits for i in range(REVOCATION_BLOOM_HASHES)]
+    
+    def _add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bloom[position >> 3] |= 1 << (position & 7)
+    
+    def _might_contain(self, key: str) -> bool:
+        return all(self._bloom[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+    
+    def _apply(self, jti: Optional[str], admin_id: Optional[int], revoked_at: float) -> None:
+        if jti:
+            self._jtis.add(jti)
+            self._add(jti)
+        elif admin_id is not None:
+            self._admins[admin_id] = max(revoked_at, self._admins.get(admin_id, 0.0))
+            self._add(f'admin:{admin_id}')
+    
+    def refresh(self) -> None:
+        """Дочитывание новых отзывов; раз в full_reload_interval фильтр строится заново без истекших строк"""
+        now = time.monotonic()
+        if self._refreshed_at and now - self._refreshed_at < self.refresh_interval:
+            return
+        # Первую загрузку ждут все запросы, дальше обновляет один поток, остальные работают по текущему состоянию
+        if not self._refresh_lock.acquire(blocking=not self._reloaded_at):
+            return
+        conn = None
+        try:
+            if self._refreshed_at and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            full = not self._reloaded_at or now - self._reloaded_at >= self.full_reload_interval
+            conn = get_db_connection()
+            with conn.cursor() as cur:
+                cur.execute(REVOKED_TOKENS_SQL, (0 if full else self._last_id,))
+                rows = cur.fetchall()
+            
+            with self._lock:
+                if full:
+                    self._bloom = bytearray(len(self._bloom))
+                    self._jtis = set()
+                    self._admins = {}
+                    self._reloaded_at = now
+                for row_id, jti, admin_id, revoked_at in rows:
+                    self._apply(jti, admin_id, revoked_at)
+                    self._last_id = max(self._last_id, row_id)
+                self._refreshed_at = now
+                self._stats['refreshes'] += 1
+        except Exception as e:
+            # БД недоступна: работаем по последнему загруженному состоянию и повторяем через интервал
+            with self._lock:
+                self._refreshed_at = now
+                self._stats['errors'] += 1
+            print(json.dumps({'event': 'revocations_refresh_failed', 'error': str(e)}))
+        finally:
+            if conn is not None:
+                release_db_connection(conn)
+            self._refresh_lock.release()
+    
+    def remember(self, jti: str) -> None:
+        """Немедленный учет отзыва, записанного этим же процессом"""
+        with self._lock:
+            self._apply(jti, None, 0.0)
+    
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Проверка payload за константное время; запрос к БД только при устаревшем состоянии"""
+        self.refresh()
+        jti = payload.get('jti')
+        admin_id = payload.get('admin_id')
+        with self._lock:
+            self._stats['checks'] += 1
+            if jti and self._might_contain(jti):
+                self._stats['bloom_hits'] += 1
+                if jti in self._jtis:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+            if admin_id is not None and self._might_contain(f'admin:{admin_id}'):
+                self._stats['bloom_hits'] += 1
+                revoked_at = self._admins.get(admin_id)
+                if revoked_at is not None and payload.get('iat', 0) <= revoked_at:
+                    self._stats['revoked'] += 1
+                    return True
+                self._stats['false_positives'] += 1
+        return False
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'jtis': len(self._jtis), 'admins': len(self._admins), 'last_id': self._last_id}
+
+REVOKED_TOKENS = RevocationFilter(REVOCATION_REFRESH_INTERVAL, REVOCATION_FULL_RELOAD_INTERVAL, REVOCATION_BLOOM_BITS)
 
 def generate_jwt_token(admin_id: int, email: str, role: str, full_name: str) -> str:
     """Генерация JWT токена с данными администратора"""
-    secret_key = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
-    
     payload = {
         'admin_id': admin_id,
         'email': email,
         'role': role,
         'full_name': full_name,
         'user_type': 'admin',
+        'jti': secrets.token_hex(16),
         'exp': datetime.utcnow() + timedelta(days=7),
         'iat': datetime.utcnow()
     }
     
-    return jwt.encode(payload, secret_key, algorithm='HS256')
+    with Span('jwt'):
+        return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
 
 def verify_jwt_token(token: str) -> Dict[str, Any]:
-    """Проверка JWT токена"""
-    secret_key = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+    """Проверка JWT токена (повторные токены берутся из кеша без проверки подписи, отзыв проверяется всегда)"""
+    payload = TOKEN_CACHE.get(token)
     
-    try:
-        payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-        return {'valid': True, 'payload': payload}
-    except jwt.ExpiredSignatureError:
-        return {'valid': False, 'error': 'Токен истек'}
-    except jwt.InvalidTokenError:
-        return {'valid': False, 'error': 'Недействительный токен'}
+    if payload is None:
+        try:
+            with Span('jwt'):
+                payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return {'valid': False, 'error': 'Токен истек'}
+        except jwt.InvalidTokenError:
+            return {'valid': False, 'error': 'Недействительный токен'}
+        TOKEN_CACHE.put(token, payload)
+    
+    if payload.get('user_type') != 'admin':
+        return {'valid': False, 'error': 'Недостаточно прав'}
+    if REVOKED_TOKENS.is_revoked(payload):
+        return {'valid': False, 'error': 'Токен отозван'}
+    return {'valid': True, 'payload': payload}
 
 def login_admin(data: Dict[str, Any]) -> Dict[str, Any]:
     """Авторизация администратора"""
@@ -65,12 +719,8 @@ def login_admin(data: Dict[str, Any]) -> Dict[str, Any]:
     
     conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT id, email, password_hash, full_name, role, is_active
-                FROM admins 
-                WHERE email = %s
-            """, (email,))
+        with conn.cursor(cursor_factory=psycopg2_extras.RealDictCursor) as cur:
+            STATEMENTS.execute(cur, 'admin_by_email', (email,))
             
             admin = cur.fetchone()
             
@@ -95,11 +745,14 @@ def login_admin(data: Dict[str, Any]) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Неверный email или пароль'})
                 }
             
-            cur.execute(
-                "UPDATE admins SET last_login = %s WHERE id = %s",
-                (datetime.now(), admin['id'])
-            )
-            conn.commit()
+            if PASSWORD_HASHER.needs_rehash(admin['password_hash']):
+                cur.execute(
+                    "UPDATE admins SET password_hash = %s, updated_at = %s WHERE id = %s",
+                    (PASSWORD_HASHER.hash(password), datetime.now(), admin['id'])
+                )
+                conn.commit()
+            
+            LAST_LOGINS.record(admin['id'], datetime.now())
             
             token = generate_jwt_token(
                 admin['id'],
@@ -126,6 +779,12 @@ def login_admin(data: Dict[str, Any]) -> Dict[str, Any]:
                     'user_type': 'admin'
                 })
             }
+    except PasswordHasherBusy:
+        return {
+            'statusCode': 503,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Retry-After': '1'},
+            'body': json.dumps({'error': 'Сервис авторизации перегружен, повторите попытку'})
+        }
     except Exception as e:
         return {
             'statusCode': 500,
@@ -133,7 +792,7 @@ def login_admin(data: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': f'Ошибка авторизации: {str(e)}'})
         }
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 def verify_token(data: Dict[str, Any]) -> Dict[str, Any]:
     """Проверка валидности JWT токена"""
@@ -167,7 +826,60 @@ def verify_token(data: Dict[str, Any]) -> Dict[str, Any]:
             })
         }
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+def logout_admin(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Выход администратора: jti токена записывается в revoked_tokens до истечения токена"""
+    token = data.get('token')
+    
+    if not token:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Токен не предоставлен'})
+        }
+    
+    result = verify_jwt_token(token)
+    if not result['valid']:
+        return {
+            'statusCode': 401,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': result['error']})
+        }
+    
+    payload = result['payload']
+    if not payload.get('jti'):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Токен выдан без jti и не может быть отозван, выполните вход заново'})
+        }
+    
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO revoked_tokens (jti, admin_id, expires_at, reason)
+                VALUES (%s, %s, to_timestamp(%s), 'logout')
+                ON CONFLICT (jti) DO NOTHING
+            """, (payload['jti'], payload.get('admin_id'), payload['exp']))
+            conn.commit()
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'Ошибка выхода: {str(e)}'})
+        }
+    finally:
+        release_db_connection(conn)
+    
+    REVOKED_TOKENS.remember(payload['jti'])
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'success': True, 'message': 'Сессия завершена'})
+    }
+
+def route_request(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
@@ -190,11 +902,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             return login_admin(body_data)
         elif action == 'verify':
             return verify_token(body_data)
+        elif action == 'logout':
+            return logout_admin(body_data)
         else:
             return {
                 'statusCode': 400,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Неизвестное действие. Используйте action: login или verify'})
+                'body': json.dumps({'error': 'Неизвестное действие. Используйте action: login, verify или logout'})
             }
     
     return {
@@ -202,3 +916,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
         'body': json.dumps({'error': 'Метод не поддерживается'})
     }
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    return with_server_timing(event, context, route_request)
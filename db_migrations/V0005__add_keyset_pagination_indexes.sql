@@ -0,0 +1,14 @@
+-- Ключ курсора (created_at, id) не может быть NULL: строка с NULL сортируется первой при DESC,
+-- а сравнение (created_at, id) < (NULL, x) дает NULL и обрывает все следующие страницы
+UPDATE orders SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL;
+ALTER TABLE orders ALTER COLUMN created_at SET NOT NULL;
+UPDATE doctors SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL;
+ALTER TABLE doctors ALTER COLUMN created_at SET NOT NULL;
+UPDATE clinics SET registration_date = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE registration_date IS NULL;
+ALTER TABLE clinics ALTER COLUMN registration_date SET NOT NULL;
+
+-- Индексы для постраничной выборки списков по курсору (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id ON orders(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created_at_id ON orders(status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_doctors_created_at_id ON doctors(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_clinics_registration_date_id ON clinics(registration_date DESC, id DESC);
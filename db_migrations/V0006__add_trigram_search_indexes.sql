@@ -0,0 +1,13 @@
+-- Триграммные GIN-индексы для поиска подстроки (ILIKE '%...%') в админ-панели
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_clinics_clinic_name_trgm ON clinics USING gin (clinic_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clinics_email_trgm ON clinics USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_clinics_city_trgm ON clinics USING gin (city gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_doctors_full_name_trgm ON doctors USING gin (full_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_doctors_specialty_trgm ON doctors USING gin (specialty gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_doctors_workplace_trgm ON doctors USING gin (workplace gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_orders_contact_person_trgm ON orders USING gin (contact_person gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_orders_visit_city_trgm ON orders USING gin (visit_city gin_trgm_ops);
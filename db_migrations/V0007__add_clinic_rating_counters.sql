@@ -0,0 +1,35 @@
+-- Сумма и количество оценок для инкрементального пересчета average_service_rating
+ALTER TABLE clinics ADD COLUMN IF NOT EXISTS service_rating_sum INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE clinics ADD COLUMN IF NOT EXISTS service_rating_count INTEGER NOT NULL DEFAULT 0;
+
+-- Разовое заполнение счетчиков клиник по существующим заявкам
+WITH stats AS (
+    SELECT
+        clinic_id,
+        COUNT(*) AS total_orders_count,
+        COUNT(*) FILTER (WHERE status = 'completed') AS completed_visits_count,
+        COUNT(*) FILTER (WHERE status IN ('new', 'confirmed', 'in_progress')) AS active_orders_count,
+        COALESCE(SUM(COALESCE(actual_cost, estimated_cost, 0))
+            FILTER (WHERE status NOT IN ('cancelled', 'rejected')), 0) AS total_orders_amount,
+        COALESCE(SUM(clinic_rating), 0) AS service_rating_sum,
+        COUNT(clinic_rating) AS service_rating_count
+    FROM orders
+    GROUP BY clinic_id
+)
+UPDATE clinics c SET
+    total_orders_count = COALESCE(s.total_orders_count, 0),
+    completed_visits_count = COALESCE(s.completed_visits_count, 0),
+    active_orders_count = COALESCE(s.active_orders_count, 0),
+    total_orders_amount = COALESCE(s.total_orders_amount, 0),
+    service_rating_sum = COALESCE(s.service_rating_sum, 0),
+    service_rating_count = COALESCE(s.service_rating_count, 0),
+    average_service_rating = CASE
+        WHEN s.service_rating_count > 0
+        THEN ROUND(s.service_rating_sum::numeric / s.service_rating_count, 2)
+    END
+FROM clinics base
+LEFT JOIN stats s ON s.clinic_id = base.id
+WHERE c.id = base.id;
+
+COMMENT ON COLUMN clinics.service_rating_sum IS 'Сумма оценок clinic_rating по заявкам клиники';
+COMMENT ON COLUMN clinics.service_rating_count IS 'Количество заявок клиники с оценкой clinic_rating';
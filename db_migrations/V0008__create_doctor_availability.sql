@@ -0,0 +1,43 @@
+-- Нормализованные даты доступности врачей для поиска по диапазону дат
+CREATE TABLE IF NOT EXISTS doctor_availability (
+    doctor_id INTEGER NOT NULL REFERENCES doctors(id) ON DELETE CASCADE,
+    available_date DATE NOT NULL,
+    specialty VARCHAR(255) NOT NULL,
+    workplace_type VARCHAR(50),
+    capacity INTEGER NOT NULL DEFAULT 1 CHECK (capacity > 0),
+    PRIMARY KEY (doctor_id, available_date)
+);
+
+-- Поиск свободных врачей: диапазон дат + специальность
+CREATE INDEX IF NOT EXISTS idx_doctor_availability_date_specialty
+    ON doctor_availability(available_date, specialty);
+
+-- Подсчет подтвержденных визитов врача на дату
+CREATE INDEX IF NOT EXISTS idx_orders_confirmed_doctor_visit
+    ON orders(doctor_id, visit_date)
+    WHERE status = 'confirmed';
+
+-- Безопасный разбор даты: свободный текст и несуществующие даты (2026-02-30) дают NULL, а не ошибку
+CREATE FUNCTION pg_temp.parse_available_date(value TEXT) RETURNS DATE AS $$
+BEGIN
+    IF value !~ '^\d{4}-\d{2}-\d{2}' THEN
+        RETURN NULL;
+    END IF;
+    RETURN LEFT(value, 10)::date;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Разовый перенос дат из doctors.available_dates (некорректные значения пропускаются)
+INSERT INTO doctor_availability (doctor_id, available_date, specialty, workplace_type)
+SELECT DISTINCT d.id, pg_temp.parse_available_date(slot.value), d.specialty, d.workplace_type
+FROM doctors d
+CROSS JOIN LATERAL jsonb_array_elements_text(
+    CASE WHEN jsonb_typeof(d.available_dates) = 'array' THEN d.available_dates ELSE '[]'::jsonb END
+) AS slot(value)
+WHERE pg_temp.parse_available_date(slot.value) IS NOT NULL
+ON CONFLICT (doctor_id, available_date) DO NOTHING;
+
+COMMENT ON TABLE doctor_availability IS 'Нормализованные даты доступности врачей (источник - doctors.available_dates)';
+COMMENT ON COLUMN doctor_availability.capacity IS 'Количество выездов врача в этот день';
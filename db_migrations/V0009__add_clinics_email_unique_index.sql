@@ -0,0 +1,26 @@
+-- Уникальность email клиник без учета регистра: защищает регистрацию от гонки двух одновременных заявок
+-- и позволяет регистрировать клинику одним INSERT ... ON CONFLICT (lower(email)) DO NOTHING
+
+-- Раньше проверялось только точное совпадение email, поэтому возможны дубли вида A@x.ru / a@x.ru.
+-- Такие записи нужно объединить вручную: миграция останавливается и перечисляет id конфликтующих клиник
+DO $$
+DECLARE
+    conflicts TEXT;
+BEGIN
+    SELECT string_agg(email || ' (id ' || ids || ')', '; ')
+    INTO conflicts
+    FROM (
+        SELECT lower(btrim(email)) AS email, string_agg(id::text, ', ' ORDER BY id) AS ids
+        FROM clinics
+        GROUP BY lower(btrim(email))
+        HAVING COUNT(*) > 1
+    ) duplicates;
+    
+    IF conflicts IS NOT NULL THEN
+        RAISE EXCEPTION 'Найдены клиники с одинаковым email без учета регистра, объедините их перед миграцией: %', conflicts;
+    END IF;
+END $$;
+
+UPDATE clinics SET email = btrim(email) WHERE email <> btrim(email);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_clinics_email_lower ON clinics (lower(email));
@@ -0,0 +1,38 @@
+-- Отозванные JWT администраторов: строка с jti отзывает один токен (выход из системы),
+-- строка без jti отзывает все токены администратора, выданные до revoked_at (блокировка)
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    id SERIAL PRIMARY KEY,
+    jti VARCHAR(64) UNIQUE,
+    admin_id INTEGER REFERENCES admins(id),
+    revoked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    expires_at TIMESTAMPTZ NOT NULL,
+    reason VARCHAR(50),
+    CHECK (jti IS NOT NULL OR admin_id IS NOT NULL)
+);
+
+-- Функции дочитывают только новые строки по id и только неистекшие
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens (expires_at);
+
+-- Блокировка администратора сразу отзывает все его токены (срок жизни JWT - 7 дней)
+CREATE OR REPLACE FUNCTION revoke_blocked_admin_tokens() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO revoked_tokens (admin_id, expires_at, reason)
+    VALUES (NEW.id, now() + INTERVAL '7 days', 'admin_blocked');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_admins_revoke_tokens ON admins;
+CREATE TRIGGER trg_admins_revoke_tokens
+    AFTER UPDATE OF is_active ON admins
+    FOR EACH ROW
+    WHEN (OLD.is_active AND NOT NEW.is_active)
+    EXECUTE FUNCTION revoke_blocked_admin_tokens();
+
+-- Уже заблокированные администраторы
+INSERT INTO revoked_tokens (admin_id, expires_at, reason)
+SELECT id, now() + INTERVAL '7 days', 'admin_blocked'
+FROM admins
+WHERE NOT is_active;
+
+COMMENT ON TABLE revoked_tokens IS 'Отозванные JWT администраторов; функции держат их в памяти (фильтр Блума + точное множество)';
@@ -0,0 +1,91 @@
+-- Счетчики клиник ведет БД: любая вставка, изменение или удаление заявки (из функций или прямым SQL)
+-- применяет к clinics разницу вкладов старой и новой версии строки
+
+-- Вклад одной заявки со знаком: +1 для новой версии строки, -1 для старой
+CREATE OR REPLACE FUNCTION apply_clinic_counter_delta(
+    p_clinic_id INTEGER,
+    p_sign INTEGER,
+    p_status VARCHAR,
+    p_estimated_cost NUMERIC,
+    p_actual_cost NUMERIC,
+    p_clinic_rating INTEGER
+) RETURNS VOID AS $$
+    UPDATE clinics SET
+        total_orders_count = COALESCE(total_orders_count, 0) + p_sign,
+        completed_visits_count = COALESCE(completed_visits_count, 0)
+            + CASE WHEN p_status = 'completed' THEN p_sign ELSE 0 END,
+        active_orders_count = COALESCE(active_orders_count, 0)
+            + CASE WHEN p_status IN ('new', 'confirmed', 'in_progress') THEN p_sign ELSE 0 END,
+        total_orders_amount = COALESCE(total_orders_amount, 0)
+            + CASE WHEN p_status NOT IN ('cancelled', 'rejected')
+                THEN p_sign * COALESCE(p_actual_cost, p_estimated_cost, 0) ELSE 0 END,
+        service_rating_sum = service_rating_sum + p_sign * COALESCE(p_clinic_rating, 0),
+        service_rating_count = service_rating_count + CASE WHEN p_clinic_rating IS NOT NULL THEN p_sign ELSE 0 END,
+        average_service_rating = CASE
+            WHEN service_rating_count + CASE WHEN p_clinic_rating IS NOT NULL THEN p_sign ELSE 0 END > 0
+            THEN ROUND(
+                (service_rating_sum + p_sign * COALESCE(p_clinic_rating, 0))::numeric
+                / (service_rating_count + CASE WHEN p_clinic_rating IS NOT NULL THEN p_sign ELSE 0 END), 2)
+        END
+    WHERE id = p_clinic_id;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION maintain_clinic_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_clinic_counter_delta(
+            OLD.clinic_id, -1, OLD.status, OLD.estimated_cost, OLD.actual_cost, OLD.clinic_rating
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_clinic_counter_delta(
+            NEW.clinic_id, 1, NEW.status, NEW.estimated_cost, NEW.actual_cost, NEW.clinic_rating
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_orders_clinic_counters ON orders;
+CREATE TRIGGER trg_orders_clinic_counters
+    AFTER INSERT OR DELETE ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION maintain_clinic_counters();
+
+-- Изменения, не затрагивающие счетчики (адрес, время визита, врач), clinics не трогают
+DROP TRIGGER IF EXISTS trg_orders_clinic_counters_update ON orders;
+CREATE TRIGGER trg_orders_clinic_counters_update
+    AFTER UPDATE ON orders
+    FOR EACH ROW
+    WHEN ((OLD.clinic_id, OLD.status, OLD.estimated_cost, OLD.actual_cost, OLD.clinic_rating)
+        IS DISTINCT FROM (NEW.clinic_id, NEW.status, NEW.estimated_cost, NEW.actual_cost, NEW.clinic_rating))
+    EXECUTE FUNCTION maintain_clinic_counters();
+
+-- Пересчет счетчиков, разошедшихся с заявками до появления триггера
+WITH stats AS (
+    SELECT
+        clinic_id,
+        COUNT(*) AS total_orders_count,
+        COUNT(*) FILTER (WHERE status = 'completed') AS completed_visits_count,
+        COUNT(*) FILTER (WHERE status IN ('new', 'confirmed', 'in_progress')) AS active_orders_count,
+        COALESCE(SUM(COALESCE(actual_cost, estimated_cost, 0))
+            FILTER (WHERE status NOT IN ('cancelled', 'rejected')), 0) AS total_orders_amount,
+        COALESCE(SUM(clinic_rating), 0) AS service_rating_sum,
+        COUNT(clinic_rating) AS service_rating_count
+    FROM orders
+    GROUP BY clinic_id
+)
+UPDATE clinics c SET
+    total_orders_count = COALESCE(s.total_orders_count, 0),
+    completed_visits_count = COALESCE(s.completed_visits_count, 0),
+    active_orders_count = COALESCE(s.active_orders_count, 0),
+    total_orders_amount = COALESCE(s.total_orders_amount, 0),
+    service_rating_sum = COALESCE(s.service_rating_sum, 0),
+    service_rating_count = COALESCE(s.service_rating_count, 0),
+    average_service_rating = CASE
+        WHEN s.service_rating_count > 0
+        THEN ROUND(s.service_rating_sum::numeric / s.service_rating_count, 2)
+    END
+FROM clinics base
+LEFT JOIN stats s ON s.clinic_id = base.id
+WHERE c.id = base.id;
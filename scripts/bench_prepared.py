@@ -0,0 +1,103 @@
+'''
+Business: Бенчмарк подготовленных запросов: обычный execute против PREPARE/EXECUTE для горячих запросов функций
+Args: --database-url (или DATABASE_URL), --iterations - число выполнений каждого запроса (по умолчанию 2000)
+Returns: время планирования (EXPLAIN ANALYZE), среднее время запроса и ускорение по каждому запросу в stdout
+'''
+
+import argparse
+import importlib.util
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+SAMPLE_PARAMS_SQL = {
+    'admin_by_email': "SELECT email FROM admins ORDER BY id LIMIT 1",
+    'clinic_by_email': "SELECT email FROM clinics ORDER BY id LIMIT 1",
+    'doctor_version': "SELECT id FROM doctors ORDER BY id LIMIT 1",
+    'doctor_by_id': "SELECT id FROM doctors ORDER BY id LIMIT 1",
+    'order_versions': "SELECT id FROM orders WHERE doctor_id IS NOT NULL ORDER BY id LIMIT 1",
+    'order_by_id': "SELECT id FROM orders WHERE doctor_id IS NOT NULL ORDER BY id LIMIT 1"
+}
+
+def load_function(name: str):
+    """Импорт index.py облачной функции по имени каталога"""
+    spec = importlib.util.spec_from_file_location(f'{name.replace("-", "_")}_index', os.path.join(BACKEND_DIR, name, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def planning_ms(cur, sql: str, params: Tuple[Any, ...]) -> Optional[float]:
+    """Planning Time из EXPLAIN ANALYZE для обычного выполнения"""
+    cur.execute('EXPLAIN (ANALYZE, SUMMARY) ' + sql, params)
+    for (line,) in cur.fetchall():
+        match = re.search(r'Planning Time: ([\d.]+) ms', line)
+        if match:
+            return float(match.group(1))
+    return None
+
+def measure(run: Callable[[], None], iterations: int) -> float:
+    """Медиана времени одного выполнения в микросекундах"""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    
+    if not args.database_url:
+        sys.exit('Нужен --database-url или DATABASE_URL')
+    
+    import psycopg2
+    
+    queries: Dict[str, str] = {}
+    for name in ('auth-admin', 'auth-clinic', 'admin-doctors', 'admin-orders'):
+        queries.update(load_function(name).STATEMENTS.queries)
+    
+    conn = psycopg2.connect(args.database_url)
+    conn.autocommit = True
+    rows: List[str] = []
+    try:
+        with conn.cursor() as cur:
+            for name, sql in queries.items():
+                cur.execute(SAMPLE_PARAMS_SQL[name])
+                sample = cur.fetchone()
+                if not sample:
+                    rows.append(f'{name:<16} пропущен: нет данных')
+                    continue
+                params = tuple(sample)
+                
+                positional = sql
+                for position in range(1, len(params) + 1):
+                    positional = positional.replace('%s', f'${position}', 1)
+                cur.execute('DEALLOCATE ALL')
+                cur.execute(f'PREPARE {name} AS {positional}')
+                execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
+                
+                plan_ms = planning_ms(cur, sql, params)
+                plain_us = measure(lambda: (cur.execute(sql, params), cur.fetchall()), args.iterations)
+                prepared_us = measure(lambda: (cur.execute(execute_sql, params), cur.fetchall()), args.iterations)
+                rows.append(
+                    f'{name:<16} planning {plan_ms if plan_ms is not None else float("nan"):6.3f} ms | '
+                    f'execute {plain_us:8.1f} us | prepared {prepared_us:8.1f} us | '
+                    f'saved {plain_us - prepared_us:7.1f} us ({plain_us / prepared_us:.2f}x)'
+                )
+    finally:
+        conn.close()
+    
+    print(f'iterations: {args.iterations}, median per query')
+    for row in rows:
+        print(row)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+'''
+Business: Микробенчмарк сериализации списка заявок: прежний цикл isoformat/float против to_json
+Args: --rows - количество строк (по умолчанию 10000), --repeat - число повторов
+Returns: время кодирования и ускорение в stdout
+'''
+
+import argparse
+import importlib.util
+import json
+import os
+import time
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+def load_function(name: str):
+    """Импорт index.py облачной функции по имени каталога"""
+    spec = importlib.util.spec_from_file_location(f'{name}_index', os.path.join(BACKEND_DIR, name, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    """Строки в том виде, в каком их возвращает RealDictCursor со стандартными типами драйвера"""
+    now = datetime(2026, 10, 1, 12, 0, 0, 250000)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'id': i, 'clinic_id': i % 50, 'doctor_id': i % 300, 'visit_date': date(2026, 11, 1) + timedelta(days=i % 30),
+            'visit_time': '10:00', 'patient_count': 1, 'service_type': 'Консультация кардиолога',
+            'urgency_level': 'normal', 'status': 'confirmed', 'contact_person': 'Иванов Иван Иванович',
+            'contact_phone': '+79001234567', 'contact_email': 'clinic@example.ru',
+            'visit_address': 'ул. Ленина, д. 1', 'visit_city': 'Москва', 'visit_region': 'Московская область',
+            'special_requirements': None, 'estimated_cost': Decimal('15000.00'), 'actual_cost': Decimal('14500.50'),
+            'payment_status': 'pending', 'prepayment_paid': False, 'clinic_comments': None,
+            'admin_notes': None, 'clinic_rating': 5, 'created_at': now - timedelta(minutes=i),
+            'updated_at': now, 'confirmed_at': now, 'completed_at': None,
+            'clinic_name': 'Клиника №1', 'clinic_email': 'clinic@example.ru', 'clinic_phone': '+79001234567',
+            'doctor_name': 'Петров Петр Петрович', 'doctor_specialty': 'Кардиолог'
+        })
+    return rows
+
+def as_driver_text(value: Any) -> Any:
+    """Текстовое представление значения, как его присылает PostgreSQL"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(' ') if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+def make_json_ready_rows(module, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Те же строки после приведений register_json_casts на уровне драйвера"""
+    ready = []
+    for row in rows:
+        converted = {}
+        for key, value in row.items():
+            if isinstance(value, (datetime, date)):
+                converted[key] = module.cast_iso_datetime(as_driver_text(value), None)
+            elif isinstance(value, Decimal):
+                converted[key] = module.cast_float(as_driver_text(value), None)
+            else:
+                converted[key] = value
+        ready.append(converted)
+    return ready
+
+def legacy_encode(rows: List[Dict[str, Any]]) -> str:
+    """Прежний подход: копия строки и поштучное преобразование полей"""
+    orders_list = []
+    for order in rows:
+        order_dict = dict(order)
+        for field in ('visit_date', 'created_at', 'updated_at', 'confirmed_at', 'completed_at'):
+            if order_dict.get(field):
+                order_dict[field] = order_dict[field].isoformat()
+        for field in ('estimated_cost', 'actual_cost'):
+            if order_dict.get(field):
+                order_dict[field] = float(order_dict[field])
+        orders_list.append(order_dict)
+    return json.dumps({'success': True, 'orders': orders_list, 'total': len(orders_list)})
+
+def measure(func: Callable[[], str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    module = load_function('admin-orders')
+    rows = make_rows(args.rows)
+    ready_rows = make_json_ready_rows(module, rows)
+    
+    def fast_encode() -> str:
+        return module.to_json({'success': True, 'orders': ready_rows, 'total': len(ready_rows)})
+    
+    def default_encode() -> str:
+        return module.to_json({'success': True, 'orders': rows, 'total': len(rows)})
+    
+    assert json.loads(legacy_encode(rows)) == json.loads(fast_encode()) == json.loads(default_encode())
+    
+    legacy = measure(lambda: legacy_encode(rows), args.repeat)
+    fallback = measure(default_encode, args.repeat)
+    fast = measure(fast_encode, args.repeat)
+    
+    print(f'rows: {args.rows}, best of {args.repeat}')
+    print(f'legacy loop + json.dumps:        {legacy * 1000:.1f} ms')
+    print(f'to_json, json_default fallback:  {fallback * 1000:.1f} ms ({legacy / fallback:.2f}x)')
+    print(f'to_json, register_json_casts:    {fast * 1000:.1f} ms ({legacy / fast:.2f}x)')
+
+if __name__ == '__main__':
+    main()
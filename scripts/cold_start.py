@@ -0,0 +1,115 @@
+'''
+Business: Замер холодного старта облачных функций: импорт index.py и первые запросы без БД (preflight, ошибка валидации)
+Args: --functions - список каталогов backend (по умолчанию все), --repeat - число запусков в отдельных процессах,
+      --baseline - git-ревизия для сравнения (например HEAD~1)
+Returns: медианы времени импорта и первых ответов, загруженные тяжелые модули, сравнение с ревизией в stdout
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, Optional
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+HEAVY_MODULES = ['psycopg2', 'psycopg2.extras', 'jwt', 'bcrypt', 'brotli']
+
+VALIDATION_EVENTS = {
+    'admin-orders': {'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': {}},
+    'admin-doctors': {'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': {}},
+    'admin-clinics': {'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': {}},
+    'auth-admin': {'httpMethod': 'POST', 'headers': {}, 'body': '{"action": "unknown"}'},
+    'auth-clinic': {'httpMethod': 'POST', 'headers': {}, 'body': '{"action": "login"}'}
+}
+
+PROBE = r'''
+import importlib.util, json, sys, time
+path, name, validation_event, heavy = sys.argv[1], sys.argv[2], json.loads(sys.argv[3]), json.loads(sys.argv[4])
+loaded = lambda: [module for module in heavy if module in sys.modules]
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location(name, path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+import_ms = (time.perf_counter() - started) * 1000
+after_import = loaded()
+started = time.perf_counter()
+preflight = module.handler({'httpMethod': 'OPTIONS', 'headers': {}}, None)
+preflight_ms = (time.perf_counter() - started) * 1000
+after_preflight = loaded()
+started = time.perf_counter()
+validation = module.handler(validation_event, None)
+validation_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({
+    'import_ms': import_ms, 'preflight_ms': preflight_ms, 'validation_ms': validation_ms,
+    'preflight_status': preflight['statusCode'], 'validation_status': validation['statusCode'],
+    'loaded_after_import': after_import, 'loaded_after_preflight': after_preflight,
+    'loaded_after_validation': loaded()
+}))
+'''
+
+def probe(path: str, name: str) -> Dict[str, Any]:
+    """Один холодный старт функции в новом интерпретаторе"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, path, name, json.dumps(VALIDATION_EVENTS[name]), json.dumps(HEAVY_MODULES)],
+        capture_output=True, text=True, check=True, env={**os.environ, 'DATABASE_URL': 'postgresql://cold-start-probe'}
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure(path: str, name: str, repeat: int) -> Dict[str, Any]:
+    """Медианы по нескольким холодным стартам"""
+    runs = [probe(path, name) for _ in range(repeat)]
+    summary = {key: statistics.median(run[key] for run in runs) for key in ('import_ms', 'preflight_ms', 'validation_ms')}
+    summary.update({key: value for key, value in runs[-1].items() if key not in summary})
+    return summary
+
+def baseline_source(revision: str, name: str, tmp_dir: str) -> Optional[str]:
+    """index.py функции из git-ревизии во временном файле"""
+    result = subprocess.run(
+        ['git', 'show', f'{revision}:backend/{name}/index.py'],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    path = os.path.join(tmp_dir, f'{name}.py')
+    with open(path, 'w', encoding='utf-8') as source:
+        source.write(result.stdout)
+    return path
+
+def format_row(label: str, summary: Dict[str, Any]) -> str:
+    return (f"  {label:<9} import {summary['import_ms']:8.1f} ms | "
+            f"OPTIONS {summary['preflight_ms']:6.2f} ms ({summary['preflight_status']}) | "
+            f"validation {summary['validation_ms']:6.2f} ms ({summary['validation_status']}) | "
+            f"loaded: import={','.join(summary['loaded_after_import']) or '-'} "
+            f"validation={','.join(summary['loaded_after_validation']) or '-'}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--functions', nargs='*', default=sorted(VALIDATION_EVENTS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in args.functions:
+            print(name)
+            current = measure(os.path.join(BACKEND_DIR, name, 'index.py'), name, args.repeat)
+            print(format_row('current', current))
+            
+            if not args.baseline:
+                continue
+            path = baseline_source(args.baseline, name, tmp_dir)
+            if not path:
+                print(f'  {args.baseline}: функция отсутствует')
+                continue
+            before = measure(path, name, args.repeat)
+            print(format_row(args.baseline[:9], before))
+            cold_before = before['import_ms'] + before['preflight_ms']
+            cold_after = current['import_ms'] + current['preflight_ms']
+            print(f'  import + OPTIONS: {cold_before:.1f} -> {cold_after:.1f} ms ({cold_before / cold_after:.1f}x)')
+
+if __name__ == '__main__':
+    main()
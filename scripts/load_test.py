@@ -0,0 +1,303 @@
+'''
+Business: Нагрузочный прогон облачных функций в одном процессе: схема из db_migrations, тестовые данные,
+          взвешенная смесь сценариев из tests.json и load_scenarios.json с заданной параллельностью
+Args: --database-url (или DATABASE_URL), --functions, --concurrency, --requests, --duration,
+      --scenarios, --reset, --no-seed, --clinics/--doctors/--orders, --json
+Returns: p50/p95/p99, RPS и неожиданные статусы по каждому сценарию в stdout (и в JSON-файл при --json)
+'''
+
+import argparse
+import glob
+import importlib.util
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+MIGRATIONS_DIR = os.path.join(ROOT_DIR, 'db_migrations')
+DEFAULT_SCENARIOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'load_scenarios.json')
+FUNCTIONS = ['admin-clinics', 'admin-doctors', 'admin-orders', 'auth-admin', 'auth-clinic']
+
+# Таблица clinics создавалась вне db_migrations, поэтому для локальной БД она создается здесь
+CLINICS_BOOTSTRAP_SQL = """
+    CREATE TABLE IF NOT EXISTS clinics (
+        id SERIAL PRIMARY KEY,
+        clinic_name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        phone VARCHAR(50),
+        region VARCHAR(255),
+        city VARCHAR(255),
+        password_hash VARCHAR(255) NOT NULL,
+        contact_person_name VARCHAR(255),
+        contact_person_position VARCHAR(255),
+        inn VARCHAR(20),
+        legal_address TEXT,
+        terms_accepted BOOLEAN DEFAULT FALSE,
+        data_processing_accepted BOOLEAN DEFAULT FALSE,
+        consent_date TIMESTAMP,
+        account_status VARCHAR(50) DEFAULT 'on_moderation',
+        registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_login TIMESTAMP,
+        total_orders_count INTEGER DEFAULT 0,
+        completed_visits_count INTEGER DEFAULT 0,
+        active_orders_count INTEGER DEFAULT 0,
+        total_orders_amount DECIMAL(12, 2) DEFAULT 0,
+        average_service_rating DECIMAL(3, 2),
+        admin_notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SEED_SQL = """
+    INSERT INTO clinics (clinic_name, email, phone, region, city, password_hash, contact_person_name,
+                         inn, terms_accepted, data_processing_accepted, consent_date, account_status)
+    SELECT 'Клиника ' || g, 'clinic' || g || '@load.test', '+7900' || lpad(g::text, 7, '0'),
+           'Московская область', (ARRAY['Москва', 'Химки', 'Подольск', 'Коломна'])[1 + g %% 4], 'seed',
+           'Контакт ' || g, lpad(g::text, 10, '0'), TRUE, TRUE, now(), 'active'
+    FROM generate_series((SELECT COUNT(*) FROM clinics) + 1, %(clinics)s) AS g;
+
+    INSERT INTO doctors (full_name, specialty, workplace, workplace_type, experience_years,
+                         prepayment_amount, rating, successful_visits_count, available_dates, status)
+    SELECT 'Врач ' || g,
+           (ARRAY['Кардиолог', 'Невролог', 'Терапевт', 'Хирург', 'Педиатр', 'Эндокринолог'])[1 + g %% 6],
+           'Больница ' || (g %% 40), (ARRAY['federal', 'private'])[1 + g %% 2], g %% 35,
+           3000 + (g %% 10) * 500, round((3 + random() * 2)::numeric, 2), (random() * 400)::int,
+           (SELECT jsonb_agg(to_char(CURRENT_DATE + day, 'YYYY-MM-DD'))
+            FROM generate_series(0, 30) AS day WHERE (day + g) %% 3 = 0),
+           'active'
+    FROM generate_series((SELECT COUNT(*) FROM doctors) + 1, %(doctors)s) AS g;
+
+    INSERT INTO orders (clinic_id, doctor_id, visit_date, visit_time, patient_count, service_type,
+                        urgency_level, status, contact_person, contact_phone, visit_address, visit_city,
+                        estimated_cost, actual_cost, clinic_rating, created_at, updated_at)
+    SELECT 1 + g %% %(clinics)s,
+           CASE WHEN g %% 4 = 0 THEN NULL ELSE 1 + g %% %(doctors)s END,
+           CURRENT_DATE + (g %% 60) - 20, '10:00', 1 + g %% 3,
+           (ARRAY['Кардиолог', 'Невролог', 'Терапевт', 'Хирург', 'Педиатр', 'Эндокринолог'])[1 + g %% 6],
+           (ARRAY['normal', 'urgent', 'planned'])[1 + g %% 3],
+           (ARRAY['new', 'confirmed', 'in_progress', 'completed', 'cancelled'])[1 + g %% 5],
+           'Контакт ' || g, '+7901' || lpad(g::text, 7, '0'), 'ул. Тестовая, д. ' || g %% 200,
+           (ARRAY['Москва', 'Химки', 'Подольск', 'Коломна'])[1 + g %% 4],
+           10000 + (g %% 20) * 500, CASE WHEN g %% 5 = 3 THEN 10000 + (g %% 20) * 450 END,
+           CASE WHEN g %% 5 = 3 THEN 1 + g %% 5 END,
+           now() - (g || ' minutes')::interval, now()
+    FROM generate_series((SELECT COUNT(*) FROM orders) + 1, %(orders)s) AS g;
+
+    DELETE FROM doctor_availability;
+    INSERT INTO doctor_availability (doctor_id, available_date, specialty, workplace_type)
+    SELECT DISTINCT d.id, LEFT(slot.value, 10)::date, d.specialty, d.workplace_type
+    FROM doctors d
+    CROSS JOIN LATERAL jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(d.available_dates) = 'array' THEN d.available_dates ELSE '[]'::jsonb END
+    ) AS slot(value);
+"""
+
+def load_function(name: str):
+    """Импорт index.py облачной функции по имени каталога"""
+    spec = importlib.util.spec_from_file_location(f'{name.replace("-", "_")}_index', os.path.join(BACKEND_DIR, name, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def prepare_database(database_url: str, reset: bool, sizes: Dict[str, int], counters_sql: str) -> None:
+    """Схема из db_migrations (только непримененные версии) и тестовые данные нужного объема"""
+    import psycopg2
+    
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            if reset:
+                cur.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+            cur.execute(CLINICS_BOOTSTRAP_SQL)
+            cur.execute("CREATE TABLE IF NOT EXISTS load_test_migrations (version VARCHAR(255) PRIMARY KEY)")
+            cur.execute("SELECT version FROM load_test_migrations")
+            applied = {row[0] for row in cur.fetchall()}
+            
+            for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, 'V*.sql'))):
+                version = os.path.basename(path)
+                if version in applied:
+                    continue
+                with open(path, encoding='utf-8') as migration:
+                    cur.execute(migration.read())
+                cur.execute("INSERT INTO load_test_migrations (version) VALUES (%s)", (version,))
+                print(f'applied {version}')
+            
+            started = time.perf_counter()
+            cur.execute(SEED_SQL, sizes)
+            cur.execute(counters_sql)
+            cur.execute("ANALYZE")
+        conn.commit()
+        print(f"seeded {sizes['clinics']} clinics, {sizes['doctors']} doctors, {sizes['orders']} orders "
+              f'in {time.perf_counter() - started:.1f}s')
+    finally:
+        conn.close()
+
+def load_scenarios(functions: List[str], extra_files: List[str]) -> List[Dict[str, Any]]:
+    """Сценарии из tests.json функций и дополнительных файлов сценариев"""
+    scenarios = []
+    for name in functions:
+        with open(os.path.join(BACKEND_DIR, name, 'tests.json'), encoding='utf-8') as tests:
+            for test in json.load(tests)['tests']:
+                scenarios.append({**test, 'function': name})
+    
+    for path in extra_files:
+        with open(path, encoding='utf-8') as extra:
+            scenarios.extend(s for s in json.load(extra)['scenarios'] if s['function'] in functions)
+    return scenarios
+
+def render(value: Any, variables: Dict[str, str], seq: int) -> Any:
+    """Подстановка {{admin_token}}, {{today}}, {{today+N}} и {{seq}} в строки сценария"""
+    if isinstance(value, dict):
+        return {key: render(item, variables, seq) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render(item, variables, seq) for item in value]
+    if isinstance(value, str) and '{{' in value:
+        for name, replacement in variables.items():
+            value = value.replace('{{' + name + '}}', replacement)
+        return value.replace('{{seq}}', str(seq))
+    return value
+
+def build_event(scenario: Dict[str, Any], variables: Dict[str, str], seq: int) -> Dict[str, Any]:
+    body = scenario.get('body')
+    return {
+        'httpMethod': scenario.get('method', 'GET'),
+        'headers': render(scenario.get('headers') or {}, variables, seq),
+        'queryStringParameters': render(scenario.get('queryParams') or {}, variables, seq),
+        'body': json.dumps(render(body, variables, seq)) if body is not None else None
+    }
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(share * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def run_load(handlers: Dict[str, Any], scenarios: List[Dict[str, Any]], variables: Dict[str, str],
+             concurrency: int, total_requests: int, duration: Optional[float], seed: int) -> Dict[str, Any]:
+    """Параллельное воспроизведение взвешенной смеси сценариев"""
+    rng = random.Random(seed)
+    weights = [scenario.get('weight', 1) for scenario in scenarios]
+    plan = rng.choices(range(len(scenarios)), weights=weights, k=total_requests)
+    counter = itertools.count()
+    results: List[List[Any]] = [[] for _ in scenarios]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+    
+    def worker() -> None:
+        while True:
+            seq = next(counter)
+            if seq >= len(plan) or (deadline and time.perf_counter() >= deadline):
+                return
+            index = plan[seq]
+            scenario = scenarios[index]
+            event = build_event(scenario, variables, seq)
+            context = SimpleNamespace(request_id=f'load-{seq}', function_name=scenario['function'])
+            started = time.perf_counter()
+            try:
+                status = handlers[scenario['function']](event, context).get('statusCode')
+            except Exception as e:
+                status = f'exception: {type(e).__name__}'
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                results[index].append((elapsed_ms, status))
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    
+    report = {'wall_seconds': round(wall, 3), 'concurrency': concurrency, 'scenarios': []}
+    for scenario, samples in zip(scenarios, results):
+        if not samples:
+            continue
+        latencies = sorted(sample[0] for sample in samples)
+        statuses: Dict[str, int] = {}
+        for _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        expected = scenario.get('expectedStatus')
+        report['scenarios'].append({
+            'function': scenario['function'],
+            'name': scenario['name'],
+            'requests': len(samples),
+            'rps': round(len(samples) / wall, 1),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2),
+            'statuses': statuses,
+            'unexpected': sum(count for status, count in statuses.items() if expected and status != str(expected))
+        })
+    report['total_requests'] = sum(item['requests'] for item in report['scenarios'])
+    report['total_rps'] = round(report['total_requests'] / wall, 1)
+    return report
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{report['total_requests']} requests in {report['wall_seconds']}s "
+          f"({report['total_rps']} req/s, concurrency {report['concurrency']})")
+    print(f"{'function':<14} {'scenario':<40} {'n':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'bad':>5}")
+    for item in report['scenarios']:
+        print(f"{item['function']:<14} {item['name'][:40]:<40} {item['requests']:>6} {item['rps']:>8} "
+              f"{item['p50_ms']:>8} {item['p95_ms']:>8} {item['p99_ms']:>8} {item['unexpected']:>5}")
+        if item['unexpected']:
+            print(f"{'':<14} statuses: {item['statuses']}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--functions', nargs='*', default=FUNCTIONS)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--duration', type=float, help='остановить прогон через N секунд')
+    parser.add_argument('--scenarios', nargs='*', default=[DEFAULT_SCENARIOS])
+    parser.add_argument('--reset', action='store_true', help='пересоздать схему public перед миграциями')
+    parser.add_argument('--no-seed', action='store_true', help='не трогать БД (только сценарии без данных)')
+    parser.add_argument('--clinics', type=int, default=200)
+    parser.add_argument('--doctors', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='сохранить отчет в JSON-файл')
+    args = parser.parse_args()
+    
+    if not args.no_seed and not args.database_url:
+        sys.exit('Нужен --database-url или DATABASE_URL (или --no-seed)')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    
+    modules = {name: load_function(name) for name in args.functions}
+    if not args.no_seed:
+        counters_sql = (modules.get('admin-orders') or load_function('admin-orders')).CLINIC_COUNTERS_REBUILD_SQL
+        prepare_database(args.database_url, args.reset, {
+            'clinics': args.clinics, 'doctors': args.doctors, 'orders': args.orders
+        }, counters_sql)
+    
+    auth_admin = modules.get('auth-admin') or load_function('auth-admin')
+    today = date.today()
+    variables = {
+        'admin_token': auth_admin.generate_jwt_token(1, 'admin@doctor-in-city.ru', 'super_admin', 'Load Test'),
+        'today': today.isoformat(),
+        **{f'today+{days}': (today + timedelta(days=days)).isoformat() for days in (1, 7, 14, 30)}
+    }
+    
+    scenarios = load_scenarios(args.functions, args.scenarios)
+    handlers = {name: module.handler for name, module in modules.items()}
+    report = run_load(handlers, scenarios, variables, args.concurrency, args.requests, args.duration, args.seed)
+    print_report(report)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as out:
+            json.dump(report, out, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()